@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from account_management.models import Member
+from aptbox_management.models import Aptship
+from cashbox_management.models import Membership
+from moneypool_management.models import Poolship
+from peripheral.models import Device
+from utils.constants import choice
+
+AUDIENCE_ALL = "all"
+AUDIENCE_CHUNK_SIZE = 1000
+BOX_OWNER_AUDIENCE_DAYS = 30
+
+
+def get_client_devices(device_type):
+    """
+    the DEVICEs of the client type
+    the devices with no os type are considered android as the login does
+    """
+    devices = Device.objects.filter(member_id__isnull=False)
+    if device_type == choice.CLIENT_TYPE_IOS:
+        return devices.filter(os_type=choice.CLIENT_TYPE_IOS)
+    return devices.exclude(os_type=choice.CLIENT_TYPE_IOS)
+
+
+def get_device_member_ids(device_type):
+    """
+    the distinct ids of the members which have a device of the client type, as a subquery
+    """
+    return get_client_devices(device_type).values("member_id").distinct()
+
+
+def get_member_audience(device_type=None, member_ids=None):
+    """
+    the MEMBERs of a broadcast as a lazy queryset
+    :param device_type: 'all' for all of the members or the client type of their devices
+    :param member_ids: the ids of the selected members, which precede the device type
+    """
+    if device_type == AUDIENCE_ALL:
+        return Member.objects.all()
+    if member_ids:
+        return Member.objects.filter(id__in=member_ids)
+    if device_type in (choice.CLIENT_TYPE_IOS, choice.CLIENT_TYPE_ANDROID):
+        return Member.objects.filter(id__in=get_device_member_ids(device_type))
+    return Member.objects.none()
+
+
+def iterate_member_chunks(members, chunk_size=AUDIENCE_CHUNK_SIZE):
+    """
+    yields the MEMBERs of the queryset as lists in id order using keyset pagination,
+    so the memory is bounded by the chunk size and each chunk costs one query
+    """
+    last_member_id = 0
+    while True:
+        chunk = list(
+            members.filter(id__gt=last_member_id).order_by("id")[:chunk_size]
+        )
+        if len(chunk) == 0:
+            return
+        yield chunk
+        last_member_id = chunk[-1].id
+
+
+def iterate_member_rows(members, fields, chunk_size=AUDIENCE_CHUNK_SIZE):
+    """
+    yields the values_list rows of the MEMBERs in chunks of id order using keyset pagination
+    :param fields: the fields of the rows, the first one must be 'id'
+    """
+    last_member_id = 0
+    while True:
+        chunk = list(
+            members.filter(id__gt=last_member_id)
+            .order_by("id")
+            .values_list(*fields)[:chunk_size]
+        )
+        if len(chunk) == 0:
+            return
+        yield chunk
+        last_member_id = chunk[-1][0]
+
+
+def get_box_owner_audience(end_date=None, delta_date=BOX_OWNER_AUDIENCE_DAYS, fields=("member_id",)):
+    """
+    the distinct owners of the cashboxes, moneypools and aptboxes which are created in the range,
+    as one UNION of the values_list queries over the MEMBERSHIP, POOLSHIP and APTSHIP tables
+    :param end_date: the (exclusive) end of the range, now if None
+    :param delta_date: the count of the days of the range
+    :param fields: the fields of the rows, e.g. ("member_id", "member__phone_number")
+    :return: a lazy queryset of the values_list rows
+    """
+    if end_date is None:
+        end_date = timezone.now()
+    created_range = {"created__lt": end_date, "created__gte": end_date - timedelta(delta_date)}
+
+    memberships = Membership.objects.filter(role=choice.CASHBOX_ROLE_OWNER, **created_range)
+    poolships = Poolship.objects.filter(role=choice.MONEYPOOL_ROLE_OWNER, **created_range)
+    aptships = Aptship.objects.filter(role=choice.APTBOX_ROLE_OWNER, **created_range)
+    # UNION (without ALL) removes the duplicate rows in the database
+    return memberships.values_list(*fields).union(
+        poolships.values_list(*fields), aptships.values_list(*fields)
+    )
@@ -0,0 +1,66 @@
+import csv
+import uuid
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account_management.audience import BOX_OWNER_AUDIENCE_DAYS, get_box_owner_audience
+from account_management.tasks import send_bulk_sms_to_members
+
+
+class Command(BaseCommand):
+    help = "exports (or sends an sms to) the distinct owners of the boxes created in a range"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--end-date", default=None,
+            help="the (exclusive) end date of the range as YYYY-MM-DD, now if not given",
+        )
+        parser.add_argument(
+            "--days", type=int, default=BOX_OWNER_AUDIENCE_DAYS,
+            help="the count of the days of the range",
+        )
+        parser.add_argument(
+            "--output", default=None,
+            help="the CSV file to write the owners into, the standard output if not given",
+        )
+        parser.add_argument(
+            "--sms-body", default=None,
+            help="start a bulk sms campaign with this body to the owners instead of exporting them",
+        )
+
+    def handle(self, *args, **options):
+        end_date = None
+        if options["end_date"] is not None:
+            end_date = timezone.make_aware(datetime.strptime(options["end_date"], "%Y-%m-%d"))
+
+        if options["sms_body"] is not None:
+            member_ids = [
+                member_id for (member_id,) in get_box_owner_audience(end_date, options["days"])
+            ]
+            # the campaign id is generated here, so the operator can resume the campaign with it
+            campaign_id = uuid.uuid4().hex
+            send_bulk_sms_to_members.delay(
+                options["sms_body"], members=member_ids, campaign_id=campaign_id
+            )
+            self.stderr.write(
+                "bulk sms to %d owners is queued (campaign %s)" % (len(member_ids), campaign_id)
+            )
+            return
+
+        owners = get_box_owner_audience(
+            end_date, options["days"], fields=("member_id", "member__phone_number")
+        )
+        if options["output"] is None:
+            self.write_owners(owners, self.stdout)
+        else:
+            with open(options["output"], "w", newline="") as f:
+                self.write_owners(owners, f)
+
+    @staticmethod
+    def write_owners(owners, f):
+        writer = csv.writer(f)
+        writer.writerow(("member_id", "phone_number"))
+        for row in owners.iterator():
+            writer.writerow(row)
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+from account_management.models import Member
+from cashbox_management.models import Membership, Period
+from moneypool_management.models import Moneypool, Poolship
+from utils.constants import choice
+from utils.mixins import daterange, date_to_datetime
+
+DAILY_REVENUE_STATS = (
+    "cashbox_owners",
+    "moneypool_owners",
+    "cashboxes",
+    "moneypools",
+    "plus_5_member_cashboxes",
+    "plus_5_member_moneypools",
+    "signed_in_members",
+)
+
+
+def get_daily_revenue_stats(start_date, end_date):
+    """
+    the daily revenue stats of the dates of the range
+    each date counts the objects created in the day before it (as the reports always did)
+    nothing is cached, the names, plans and members of the counted objects keep changing after their day
+    :return: an OrderedDict of date to a dict of the DAILY_REVENUE_STATS counts
+    """
+    dates = list(daterange(start_date, end_date))
+    calculated_stats = calculate_daily_revenue_stats(dates) if len(dates) > 0 else dict()
+
+    stats = OrderedDict()
+    for date in dates:
+        stats[date] = calculated_stats[date]
+    return stats
+
+
+def calculate_daily_revenue_stats(dates):
+    """
+    calculates the DAILY_REVENUE_STATS of the dates with one grouped query per table
+    :param dates: a list of dates
+    :return: a dict of date to a dict of the DAILY_REVENUE_STATS counts
+    """
+    stats = {date: dict.fromkeys(DAILY_REVENUE_STATS, 0) for date in dates}
+    created_range = {
+        "created__gt": date_to_datetime(min(dates) - timedelta(1)),
+        "created__lte": date_to_datetime(max(dates)),
+    }
+
+    def add(stat, created_date, count):
+        if created_date is None:
+            # TruncDate is NULL when MySQL cannot convert to the current time zone (no time zone tables)
+            raise ValueError("cannot bucket the {} by their local creation date".format(stat))
+        # the stats of a date are the objects created in its previous day
+        date = created_date + timedelta(1)
+        if date in stats:
+            stats[date][stat] += count
+
+    members = (
+        Member.objects.filter(**created_range)
+        .exclude(first_name="", last_name="")
+        .annotate(created_date=TruncDate("created"))
+        .values("created_date")
+        .annotate(count=Count("id"))
+    )
+    for row in members:
+        add("signed_in_members", row["created_date"], row["count"])
+
+    # the owners are bucketed by the creation of their member and the boxes by their own creation,
+    # grouping on both dates answers both in one pass
+    member_created_range = {
+        "member__" + lookup: value for lookup, value in created_range.items()
+    }
+    for model, owners_stat, boxes_stat in (
+            (Membership, "cashbox_owners", "cashboxes"),
+            (Poolship, "moneypool_owners", "moneypools"),
+    ):
+        owner_rows = (
+            model.objects.filter(
+                Q(**created_range) | Q(**member_created_range),
+                member__plan=choice.MEMBER_PLAN_FREEMIUM,
+                role=choice.CASHBOX_ROLE_OWNER,
+            )
+            .annotate(
+                member_created_date=TruncDate("member__created"),
+                created_date=TruncDate("created"),
+            )
+            .values("member_created_date", "created_date")
+            .annotate(count=Count("id"))
+        )
+        for row in owner_rows:
+            add(owners_stat, row["member_created_date"], row["count"])
+            add(boxes_stat, row["created_date"], row["count"])
+
+    for model, stat in (
+            (Period, "plus_5_member_cashboxes"),
+            (Moneypool, "plus_5_member_moneypools"),
+    ):
+        plus_5_member_ids = (
+            model.objects.filter(**created_range)
+            .annotate(member_count=Count("members"))
+            .filter(member_count__gte=5)
+            .values("id")
+        )
+        rows = (
+            model.objects.filter(id__in=plus_5_member_ids)
+            .annotate(created_date=TruncDate("created"))
+            .values("created_date")
+            .annotate(count=Count("id"))
+        )
+        for row in rows:
+            add(stat, row["created_date"], row["count"])
+
+    return stats
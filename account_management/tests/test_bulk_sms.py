@@ -0,0 +1,36 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from account_management import tasks
+from account_management.models import Member
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class BulkSmsCampaignTest(TestCase):
+    def setUp(self):
+        self.members = [
+            Member.objects.create(phone_number="0912000000%d" % index) for index in range(5)
+        ]
+
+    def run_campaign(self, campaign_id=None):
+        # the chained batches are run inline instead of on the bulk queue
+        with mock.patch.object(tasks, "send_high_priority_sms") as send_sms, \
+                mock.patch.object(tasks, "BULK_SMS_BATCH_SIZE", 2), \
+                mock.patch.object(tasks.send_bulk_sms_batch, "delay",
+                                  side_effect=tasks.send_bulk_sms_batch):
+            campaign_id = tasks.send_bulk_sms_to_members(
+                "body", members=[member.id for member in self.members], campaign_id=campaign_id
+            )
+        return campaign_id, [call[1]["phone_number"] for call in send_sms.call_args_list]
+
+    def test_campaign_sends_each_member_once(self):
+        _, phone_numbers = self.run_campaign()
+        self.assertEqual(phone_numbers, [member.phone_number for member in self.members])
+
+    def test_completed_campaign_is_not_sent_again(self):
+        campaign_id, _ = self.run_campaign()
+        _, phone_numbers = self.run_campaign(campaign_id)
+        self.assertEqual(phone_numbers, [])
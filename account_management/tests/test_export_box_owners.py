@@ -0,0 +1,22 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+
+class ExportBoxOwnersSmsTest(SimpleTestCase):
+    @mock.patch(
+        "account_management.management.commands.export_box_owners.get_box_owner_audience",
+        return_value=[(1,), (2,)],
+    )
+    @mock.patch(
+        "account_management.management.commands.export_box_owners.send_bulk_sms_to_members"
+    )
+    def test_the_printed_campaign_id_is_the_one_sent(self, send_bulk_sms, _):
+        stderr = StringIO()
+        call_command("export_box_owners", sms_body="body", stderr=stderr)
+
+        campaign_id = send_bulk_sms.delay.call_args[1]["campaign_id"]
+        self.assertEqual(send_bulk_sms.delay.call_args[1]["members"], [1, 2])
+        self.assertIn("campaign %s" % campaign_id, stderr.getvalue())
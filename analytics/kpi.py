@@ -0,0 +1,191 @@
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import transaction as db_transaction
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    Count,
+    F,
+    IntegerField,
+    Max,
+    Min,
+    Q,
+    Sum,
+    When,
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from analytics.models.daily_kpi import DailyKPI
+from payment.models import Transaction
+from utils.constants import choice
+from utils.mixins import date_to_datetime
+
+DAILY_KPI_KEY_FIELDS = ("date", "box_type", "source", "destination")
+DAILY_KPI_FIELDS = ("transactions_count", "amount", "gateway_amount", "commission")
+
+CASHBOX_KPI = Q(box_type=choice.TRANSACTION_CTX_TYPE_CYCLE)
+MONEYPOOL_KPI = Q(box_type=choice.TRANSACTION_CTX_TYPE_MONEYPOOL)
+# the wallet TRANSACTIONs are the ones in the context of their MEMBER rather than a box
+WALLET_KPI = Q(box_type=choice.TRANSACTION_CTX_TYPE_MEMBER)
+GATEWAY_CASHIN_KPI = Q(source=choice.TRANSACTION_SRC_GATEWAY)
+WALLET_CASHIN_KPI = Q(source=choice.TRANSACTION_SRC_HAMYAN_WALLET)
+CASH_CASHOUT_KPI = Q(destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT)
+WALLET_CASHOUT_KPI = Q(destination=choice.TRANSACTION_DST_HAMYAN_WALLET)
+
+# the lines of the KPI report, each one is (title, field, condition)
+KPI_REPORT_LINES = (
+    ("Successful Transactions", "transactions_count", None),
+    ("Total Gateway Cashins Amount", "gateway_amount",
+     (CASHBOX_KPI | MONEYPOOL_KPI | (WALLET_KPI & WALLET_CASHOUT_KPI)) & GATEWAY_CASHIN_KPI),
+    ("Cashbox Gateway Cashins Amount", "gateway_amount", CASHBOX_KPI & GATEWAY_CASHIN_KPI),
+    ("Moneypool Gateway Cashins Amount", "gateway_amount", MONEYPOOL_KPI & GATEWAY_CASHIN_KPI),
+    ("Total Wallet Cashins Amount", "amount", (CASHBOX_KPI | MONEYPOOL_KPI) & WALLET_CASHIN_KPI),
+    ("Cashbox Wallet Cashins Amount", "amount", CASHBOX_KPI & WALLET_CASHIN_KPI),
+    ("Moneypool Wallet Cashins Amount", "amount", MONEYPOOL_KPI & WALLET_CASHIN_KPI),
+    ("Total Cash Cashouts Amount", "amount", (CASHBOX_KPI | MONEYPOOL_KPI) & CASH_CASHOUT_KPI),
+    ("Cashbox Cash Cashouts Amount", "amount", CASHBOX_KPI & CASH_CASHOUT_KPI),
+    ("Moneypool Cash Cashouts Amount", "amount", MONEYPOOL_KPI & CASH_CASHOUT_KPI),
+    ("Total Wallet Cashouts Amount", "amount", (CASHBOX_KPI | MONEYPOOL_KPI) & WALLET_CASHOUT_KPI),
+    ("Cashbox Wallet Cashouts Amount", "amount", CASHBOX_KPI & WALLET_CASHOUT_KPI),
+    ("Moneypool Wallet Cashouts Amount", "amount", MONEYPOOL_KPI & WALLET_CASHOUT_KPI),
+    ("Wallet Cashins Amount", "gateway_amount",
+     WALLET_KPI & GATEWAY_CASHIN_KPI & WALLET_CASHOUT_KPI),
+    ("Commissions Amount", "commission", None),
+    ("Total Turnover", "amount", None),
+)
+
+
+def calculate_daily_kpis(start_date, end_date):
+    """
+    groups the successful TRANSACTIONs of the dates of the range (inclusive) by
+    the date they became successful in, their box type, source and destination
+    :return: a list of dicts of the DAILY_KPI_KEY_FIELDS and the DAILY_KPI_FIELDS
+    """
+    rows = (
+        Transaction.objects.filter(
+            state=choice.TRANSACTION_STATE_SUCCESSFUL,
+            is_group_pay=False,
+            state_time__gte=date_to_datetime(start_date),
+            state_time__lt=date_to_datetime(end_date + timedelta(1)),
+        )
+        .annotate(kpi_date=TruncDate("state_time"))
+        .values("kpi_date", "ctx_type", "source", "destination")
+        .annotate(
+            transactions_count=Count("id"),
+            amount_sum=Coalesce(Sum("amount"), 0),
+            gateway_amount_sum=Coalesce(
+                Sum(
+                    Case(
+                        When(gateway__isnull=False, then=F("amount")),
+                        default=0,
+                        output_field=IntegerField(),
+                    )
+                ),
+                0,
+            ),
+            commission_sum=Coalesce(Sum("commission"), 0),
+        )
+        .order_by()
+    )
+    return [
+        {
+            "date": row["kpi_date"],
+            "box_type": row["ctx_type"] or "",
+            "source": row["source"] or "",
+            "destination": row["destination"] or "",
+            "transactions_count": row["transactions_count"],
+            "amount": row["amount_sum"],
+            "gateway_amount": row["gateway_amount_sum"],
+            "commission": row["commission_sum"],
+        }
+        for row in rows
+    ]
+
+
+def roll_up_daily_kpis(start_date, end_date):
+    """
+    (re)writes the DailyKPI rows of the dates of the range (inclusive), so it can be rerun safely
+    the rows of the keys which have no transactions anymore are zeroed
+    :return: the count of the written rows
+    """
+    rows = calculate_daily_kpis(start_date, end_date)
+    with db_transaction.atomic():
+        kpis = {
+            tuple(getattr(kpi, field) for field in DAILY_KPI_KEY_FIELDS): kpi
+            for kpi in DailyKPI.objects.select_for_update().filter(
+                date__gte=start_date, date__lte=end_date
+            )
+        }
+        for row in rows:
+            key = tuple(row[field] for field in DAILY_KPI_KEY_FIELDS)
+            kpi = kpis.pop(key, None)
+            if kpi is None:
+                kpi = DailyKPI(**{field: row[field] for field in DAILY_KPI_KEY_FIELDS})
+            for field in DAILY_KPI_FIELDS:
+                setattr(kpi, field, row[field])
+            kpi.save()
+        for kpi in kpis.values():
+            for field in DAILY_KPI_FIELDS:
+                setattr(kpi, field, 0)
+            kpi.save()
+    return len(rows)
+
+
+def roll_up_new_daily_kpis():
+    """
+    rolls up the days after the last rolled up date till yesterday
+    (the first run rolls up the whole history from the first successful TRANSACTION)
+    :return: the count of the written rows
+    """
+    end_date = timezone.localtime(timezone.now()).date() - timedelta(1)
+    last_date = DailyKPI.objects.aggregate(last_date=Max("date"))["last_date"]
+    if last_date is not None:
+        start_date = last_date + timedelta(1)
+    else:
+        first_time = Transaction.objects.filter(
+            state=choice.TRANSACTION_STATE_SUCCESSFUL, state_time__isnull=False
+        ).aggregate(first_time=Min("state_time"))["first_time"]
+        if first_time is None:
+            return 0
+        start_date = timezone.localtime(first_time).date()
+    if start_date > end_date:
+        return 0
+    return roll_up_daily_kpis(start_date, end_date)
+
+
+def get_kpi_report(start_date=None, end_date=None):
+    """
+    sums the DailyKPI rows of the range (inclusive) into the KPI_REPORT_LINES with one query
+    :param start_date: the first date of the range, None for the beginning
+    :param end_date: the last date of the range, None for the last rolled up date
+    :return: an OrderedDict of the line title to its value
+    """
+    kpis = DailyKPI.objects.all()
+    if start_date is not None:
+        kpis = kpis.filter(date__gte=start_date)
+    if end_date is not None:
+        kpis = kpis.filter(date__lte=end_date)
+
+    aggregates = dict()
+    for index, (title, field, condition) in enumerate(KPI_REPORT_LINES):
+        if condition is None:
+            aggregates["line_%d" % index] = Coalesce(Sum(field), 0)
+        else:
+            aggregates["line_%d" % index] = Coalesce(
+                Sum(
+                    Case(
+                        When(condition, then=F(field)),
+                        default=0,
+                        output_field=BigIntegerField(),
+                    )
+                ),
+                0,
+            )
+    values = kpis.aggregate(**aggregates)
+
+    report = OrderedDict()
+    for index, (title, field, condition) in enumerate(KPI_REPORT_LINES):
+        report[title] = values["line_%d" % index]
+    return report
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+from utils.models import BaseModel
+
+
+class DailyKPI(BaseModel):
+    """
+    the daily fact row of the successful TRANSACTIONs which share a box type, a source and a destination
+    the rows are rolled up nightly so the KPI reports of a range are a SUM over a few hundred rows
+
+    FIELDS
+    date: the date which the TRANSACTIONs became successful in
+    box_type: the context type of the TRANSACTIONs (cycle, moneypool, member for the wallet ones, ...)
+    source: the source of the TRANSACTIONs
+    destination: the destination of the TRANSACTIONs
+    transactions_count: the count of the TRANSACTIONs
+    amount: the sum of the amounts in Tomans
+    gateway_amount: the sum of the amounts which are paid through a GATEWAY in Tomans
+    commission: the sum of the commissions in Tomans
+    """
+    date = models.DateField(_("Date"), db_index=True)
+    box_type = models.CharField(_("Box Type"), max_length=20, default="", blank=True)
+    source = models.CharField(_("Source"), max_length=20, default="", blank=True)
+    destination = models.CharField(_("Destination"), max_length=20, default="", blank=True)
+    transactions_count = models.IntegerField(_("Transactions Count"), default=0)
+    amount = models.BigIntegerField(_("Amount"), default=0)
+    gateway_amount = models.BigIntegerField(_("Gateway Amount"), default=0)
+    commission = models.BigIntegerField(_("Commission"), default=0)
+
+    class Meta:
+        verbose_name = _("daily KPI")
+        verbose_name_plural = _("daily KPIs")
+        unique_together = (("date", "box_type", "source", "destination"),)
+
+    def __str__(self):
+        return "%s (%s) %s>>%s" % (
+            str(self.date), self.box_type, self.source, self.destination
+        )
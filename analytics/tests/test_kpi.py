@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from account_management.models import Member
+from analytics.kpi import WALLET_KPI, get_kpi_report, roll_up_daily_kpis
+from analytics.models.daily_kpi import DailyKPI
+from payment.models import Transaction
+from utils.constants import choice
+
+
+class DailyKPITest(TestCase):
+    def setUp(self):
+        self.date = timezone.localtime(timezone.now()).date() - timedelta(1)
+        state_time = timezone.now() - timedelta(1)
+        self.cashin = Transaction.objects.create(
+            ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+            ctx_id=1,
+            source=choice.TRANSACTION_SRC_HAMYAN_WALLET,
+            destination=choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE,
+            amount=1000,
+            state=choice.TRANSACTION_STATE_SUCCESSFUL,
+            state_time=state_time,
+        )
+        Transaction.objects.create(
+            ctx_type=choice.TRANSACTION_CTX_TYPE_MONEYPOOL,
+            ctx_id=1,
+            source=choice.TRANSACTION_SRC_HAMYAN_WALLET,
+            destination=choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE,
+            amount=500,
+            state=choice.TRANSACTION_STATE_SUCCESSFUL,
+            state_time=state_time,
+        )
+        Transaction.objects.create(
+            ctx_type=choice.TRANSACTION_CTX_TYPE_MONEYPOOL,
+            ctx_id=1,
+            source=choice.TRANSACTION_SRC_HAMYAN_WALLET,
+            destination=choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE,
+            amount=700,
+            state=choice.TRANSACTION_STATE_FAILED,
+            state_time=state_time,
+        )
+
+    def test_report_sums_the_rolled_up_days(self):
+        roll_up_daily_kpis(self.date, self.date)
+        report = get_kpi_report(self.date, self.date)
+
+        self.assertEqual(report["Successful Transactions"], 2)
+        self.assertEqual(report["Total Turnover"], 1500)
+        self.assertEqual(report["Cashbox Wallet Cashins Amount"], 1000)
+        self.assertEqual(report["Moneypool Wallet Cashins Amount"], 500)
+
+    def test_rolling_up_again_rewrites_the_day(self):
+        roll_up_daily_kpis(self.date, self.date)
+        rows_count = DailyKPI.objects.count()
+
+        Transaction.objects.filter(pk=self.cashin.pk).update(
+            state=choice.TRANSACTION_STATE_FAILED
+        )
+        roll_up_daily_kpis(self.date, self.date)
+
+        self.assertEqual(DailyKPI.objects.count(), rows_count)
+        report = get_kpi_report(self.date, self.date)
+        self.assertEqual(report["Successful Transactions"], 1)
+        self.assertEqual(report["Cashbox Wallet Cashins Amount"], 0)
+
+    def test_wallet_rows_are_the_member_context_ones(self):
+        member = Member.objects.create(phone_number="09120000001")
+        Transaction.objects.create(
+            payer=member,
+            receiver=member,
+            ctx_type=choice.TRANSACTION_CTX_TYPE_MEMBER,
+            ctx_id=member.id,
+            source=choice.TRANSACTION_SRC_GATEWAY,
+            destination=choice.TRANSACTION_DST_HAMYAN_WALLET,
+            amount=300,
+            state=choice.TRANSACTION_STATE_SUCCESSFUL,
+            state_time=timezone.now() - timedelta(1),
+        )
+        roll_up_daily_kpis(self.date, self.date)
+
+        wallet_kpis = DailyKPI.objects.filter(WALLET_KPI)
+        self.assertEqual([kpi.amount for kpi in wallet_kpis], [300])
+        self.assertEqual(DailyKPI.objects.exclude(WALLET_KPI).count(), 2)
@@ -26,6 +26,7 @@ app.conf.timezone = "Asia/Tehran"
 app.conf.task_queues = (
     Queue('default'),
     Queue('high_priority'),
+    Queue('bulk'),
 )
 
 
@@ -15,6 +15,7 @@ from cashbox_management.models.membership import Membership
 from cashbox_management.models.period import Period
 from cashbox_management.models.winner import Winner
 from payment.models import Transaction
+from payment.querysets import cashbox_transactions
 from utils.admin import BaseAdmin
 from utils.constants import choice
 from utils.mixins import comma_separate
@@ -245,17 +246,8 @@ class LinkedWinnerInline(admin.TabularInline):
 
 
 def get_transactions(modeladmin, request, queryset):
-    from payment.models import Transaction
-
     cashbox = queryset.first()
-    cycles_id = list()
-    for period in cashbox.periods.all():
-        for cycle in period.cycles.all():
-            cycles_id.append(cycle.id)
-    transactions = Transaction.objects.filter(
-        ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
-        ctx_id__in=cycles_id
-    )
+    transactions = cashbox_transactions(cashbox)
     context = {
         'transactions': transactions
     }
@@ -263,17 +255,9 @@ def get_transactions(modeladmin, request, queryset):
 
 
 def get_successful_transactions(modeladmin, request, queryset):
-    from payment.models import Transaction
-
     cashbox = queryset.first()
-    cycles_id = list()
-    for period in cashbox.periods.all():
-        for cycle in period.cycles.all():
-            cycles_id.append(cycle.id)
-    transactions = Transaction.objects.filter(
-        ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
-        ctx_id__in=cycles_id,
-        state=choice.TRANSACTION_STATE_SUCCESSFUL
+    transactions = cashbox_transactions(
+        cashbox, state=choice.TRANSACTION_STATE_SUCCESSFUL
     )
     context = {
         'transactions': transactions
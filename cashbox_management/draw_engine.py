@@ -0,0 +1,110 @@
+import random
+from collections import OrderedDict
+
+_seed_generator = random.SystemRandom()
+
+
+def generate_draw_seed():
+    """
+    a fresh random seed which fits into a BigIntegerField
+    """
+    return _seed_generator.getrandbits(63)
+
+
+class FenwickTree(object):
+    """
+    the prefix sums of the weights, which are searched and updated in O(log n)
+    """
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.tree = [0] + list(weights)
+        for index in range(1, self.size + 1):
+            parent = index + (index & -index)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[index]
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def find(self, point):
+        """
+        the (0-based) index of the first weight whose prefix sum exceeds the point
+        """
+        index = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            next_index = index + step
+            if next_index <= self.size and self.tree[next_index] <= point:
+                index = next_index
+                point -= self.tree[next_index]
+            step >>= 1
+        return index
+
+
+class WeightedDraw(object):
+    """
+    draws winners out of weighted candidates by searching the prefix sums of their weights,
+    so a candidate with many shares is never expanded into a list of copies
+    the same candidates (in the same order) and the same seed always give the same winners
+    """
+
+    def __init__(self, candidates, seed=None):
+        """
+        :param candidates: an iterable of (candidate, weight) pairs, the ones without weight are ignored
+        :param seed: the seed of the draw, a new one is generated if None
+        """
+        self.candidates = [
+            (candidate, weight) for candidate, weight in candidates if weight > 0
+        ]
+        self.seed = generate_draw_seed() if seed is None else seed
+        self._random = random.Random(self.seed)
+
+    def draw(self, winners_count=1):
+        """
+        draws the winners without replacement
+        :param winners_count: the number of the winners
+        :return: a list of the winners, shorter than winners_count if candidates run out
+        """
+        weights = FenwickTree([weight for _, weight in self.candidates])
+        total_weight = sum(weight for _, weight in self.candidates)
+        winners = []
+        while total_weight > 0 and len(winners) < winners_count:
+            index = weights.find(self._random.random() * total_weight)
+            candidate, weight = self.candidates[index]
+            # the winner is drawn without replacement by zeroing its weight
+            weights.add(index, -weight)
+            total_weight -= weight
+            winners.append(candidate)
+        return winners
+
+
+def membership_candidates(memberships):
+    """
+    the (member, non won shares) pairs of the MEMBERSHIPs in a stable order to be replayable
+    """
+    return [
+        (membership.member, membership.non_won_shares)
+        for membership in sorted(memberships, key=lambda membership: membership.pk)
+    ]
+
+
+def drawable_candidates(drawable_list):
+    """
+    collapses a weighted drawable list (each MEMBERSHIP or SHARE GROUP repeated once per share)
+    into (drawable, weight) pairs in a stable order to be replayable
+    """
+    weights = OrderedDict()
+    for drawable in sorted(drawable_list, key=drawable_key):
+        weights[drawable] = weights.get(drawable, 0) + 1
+    return list(weights.items())
+
+
+def drawable_key(drawable):
+    """
+    the JSON serializable [model name, id] key of a drawable, which the draw weights are persisted by
+    """
+    return [drawable._meta.model_name, drawable.pk]
@@ -0,0 +1,127 @@
+from django.db import transaction as db_transaction
+
+from cashbox_management.models import Cashbox
+from cashbox_management.models.winner import Winner
+from utils.constants import choice
+from utils.constants.announcements import (
+    DRAW_TYPE_MANUAL,
+    DRAW_TYPE_AUTOMATIC,
+    DRAW_TYPE_SEMI_AUTOMATIC,
+)
+
+
+class DrawResult(object):
+    """
+    everything the announcements of a draw need, computed once when the draw is done
+
+    FIELDS
+    cashbox_id: the id of the drawn CASHBOX
+    cycle_id: the id of the drawn CYCLE
+    cashbox_name: the name of the CASHBOX
+    winning_cycle_index: the index of the drawn CYCLE
+    draw_type: the choice represents the type of the draw (manual/automatic/semi-automatic)
+    draw_text: the text of the draw type used in the announcements
+    amount: the checked out balance of the CASHBOX, the sum of the loan amounts of the winners
+    winners_name: the name of the single winner, None if the CYCLE has several winners
+    winner_member_ids: the ids of the members which are won
+    recipient_member_ids: the ids of the other valid members of the PERIOD
+    """
+
+    FIELDS = (
+        "cashbox_id",
+        "cycle_id",
+        "cashbox_name",
+        "winning_cycle_index",
+        "draw_type",
+        "draw_text",
+        "amount",
+        "winners_name",
+        "winner_member_ids",
+        "recipient_member_ids",
+    )
+
+    def __init__(self, **kwargs):
+        for field in self.FIELDS:
+            setattr(self, field, kwargs.get(field))
+
+    def to_dict(self):
+        """
+        a JSON serializable dict to be passed to the celery tasks
+        """
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def get_draw_text(draw_type):
+    if draw_type == choice.DRAW_AUTOMATIC:
+        return DRAW_TYPE_AUTOMATIC
+    elif draw_type == choice.DRAW_SEMI_AUTOMATIC:
+        return DRAW_TYPE_SEMI_AUTOMATIC
+    return DRAW_TYPE_MANUAL
+
+
+class DrawPipeline(object):
+    """
+    runs the draw of the current CYCLE of a CASHBOX in one atomic block with the CASHBOX and CYCLE
+    rows locked, builds the DrawResult once and defers its announcements to a celery task on commit
+    """
+
+    def __init__(self, cashbox, winner=None, draw_type=None):
+        """
+        :param cashbox: the CASHBOX to be drawn
+        :param winner: a Member object if the draw is manual and None if it is automatic
+        :param draw_type: the type of the draw, inferred from the winner if None
+        """
+        self.cashbox = cashbox
+        self.winner = winner
+        if draw_type is None:
+            draw_type = (
+                choice.DRAW_MANUAL if winner is not None else choice.DRAW_AUTOMATIC
+            )
+        self.draw_type = draw_type
+
+    def run(self):
+        """
+        :return: the DrawResult or None if the CASHBOX could not be drawn
+        """
+        from cashbox_management.tasks import announce_draw_result
+
+        with db_transaction.atomic():
+            cashbox = Cashbox.objects.select_for_update().get(pk=self.cashbox.pk)
+            if cashbox.state == choice.CASHBOX_STATE_INACTIVATED:
+                return None
+            cycle = cashbox.lock_current_cycle()
+            if cycle is None or cycle.is_drawn:
+                # the current cycle is already drawn and finished
+                return None
+
+            if cashbox.draw_cycle_and_start_new(self.winner) is None:
+                # nothing of a failed draw may be committed
+                db_transaction.set_rollback(True)
+                return None
+
+            winners = list(Winner.objects.filter(cycle=cycle))
+            winner_member_ids = cashbox.get_winner_member_ids(winners)
+            result = DrawResult(
+                cashbox_id=cashbox.id,
+                cycle_id=cycle.id,
+                cashbox_name=cashbox.name,
+                winning_cycle_index=cycle.index,
+                draw_type=self.draw_type,
+                draw_text=get_draw_text(self.draw_type),
+                amount=sum(winner.loan_amount for winner in winners),
+                winners_name=winners[0].name if len(winners) == 1 else None,
+                winner_member_ids=sorted(winner_member_ids),
+                recipient_member_ids=sorted(
+                    cashbox.get_valid_member_ids() - winner_member_ids
+                ),
+            )
+            db_transaction.on_commit(
+                lambda: announce_draw_result.delay(result.to_dict())
+            )
+
+        self.cashbox = cashbox
+        return result
@@ -0,0 +1,88 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, pre_save
+
+from account_management.models.member import Member
+from cashbox_management.models.membership import Membership
+from utils.log import info_logger
+
+
+def invite_members(period, invitations):
+    """
+    invites the owners of the phone numbers to the PERIOD with a fixed number of queries
+    the existing MEMBERs are resolved with one query and the missing MEMBERs and MEMBERSHIPs are bulk created
+    the MEMBERs are created with bulk_create, which skips their save signals, so the signals are sent
+    explicitly to keep the side effects of the MEMBER creation of the single invitation
+    :param period: the PERIOD which the members are invited to, nothing is invited if it is None
+    :param invitations: a list of dicts with the (validated) 'phone_number' and the 'number_of_shares'
+    :return: a tuple of the newly invited MEMBERSHIPs and the set of the ids of the created MEMBERs
+    """
+    if period is None:
+        return [], set()
+
+    shares = {
+        invitation["phone_number"]: invitation.get("number_of_shares", 1)
+        for invitation in invitations
+    }
+    phone_numbers = list(shares)
+
+    with db_transaction.atomic():
+        existing_phone_numbers = set(
+            Member.objects.filter(phone_number__in=phone_numbers).values_list(
+                "phone_number", flat=True
+            )
+        )
+        missing_phone_numbers = [
+            phone_number
+            for phone_number in phone_numbers
+            if phone_number not in existing_phone_numbers
+        ]
+        missing_members = [
+            Member(phone_number=phone_number) for phone_number in missing_phone_numbers
+        ]
+        for member in missing_members:
+            pre_save.send(sender=Member, instance=member, raw=False, using="default",
+                          update_fields=None)
+        Member.objects.bulk_create(missing_members)
+        # MySQL does not return the ids of bulk inserts, so the members are read back
+        members = {
+            member.phone_number: member
+            for member in Member.objects.filter(phone_number__in=phone_numbers)
+        }
+        for phone_number in missing_phone_numbers:
+            post_save.send(sender=Member, instance=members[phone_number], created=True,
+                           raw=False, using="default", update_fields=None)
+
+        enrolled_member_ids = set(
+            Membership.objects.filter(
+                period=period, member_id__in=[member.id for member in members.values()]
+            ).values_list("member_id", flat=True)
+        )
+        Membership.bulk_create_with_web_keys(
+            [
+                Membership(
+                    member=member,
+                    period=period,
+                    number_of_shares=shares[phone_number],
+                )
+                for phone_number, member in members.items()
+                if member.id not in enrolled_member_ids
+            ]
+        )
+        memberships = list(
+            Membership.objects.filter(
+                period=period, member_id__in=[member.id for member in members.values()]
+            )
+            .exclude(member_id__in=enrolled_member_ids)
+            .select_related("member")
+        )
+
+    if len(missing_phone_numbers) > 0:
+        info_logger.info(
+            "{} members are created through bulk invitation".format(
+                len(missing_phone_numbers)
+            )
+        )
+    created_member_ids = {
+        members[phone_number].id for phone_number in missing_phone_numbers
+    }
+    return memberships, created_member_ids
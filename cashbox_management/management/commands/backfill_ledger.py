@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from cashbox_management.models.ledger import (
+    LEDGER_BACKFILL_CHUNK_SIZE,
+    open_legacy_balances,
+    replay_cycle_payments,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "replays the historical cycle payments into the ledger and opens the current balances, "
+        "after which LEDGER_BALANCES_ENABLED can be turned on"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=LEDGER_BACKFILL_CHUNK_SIZE,
+            help="the count of the rows written per chunk",
+        )
+
+    def handle(self, *args, **options):
+        replayed_count = replay_cycle_payments(options["chunk_size"])
+        opened_count = open_legacy_balances(options["chunk_size"])
+        self.stderr.write(
+            "%d payments replayed, %d balances opened" % (replayed_count, opened_count)
+        )
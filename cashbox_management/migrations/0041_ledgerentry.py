@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0035_auto_20190513_1827'),
+        ('cashbox_management', '0040_auto_20190623_1145'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('removed', models.DateTimeField(blank=True, default=None, editable=False, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+                ('amount', models.IntegerField(default=0, verbose_name='Amount')),
+                ('is_checked_out', models.BooleanField(default=False, verbose_name='Is Checked Out')),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='cashbox_management.Membership')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='cashbox_management.Period')),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entry', to='payment.Transaction')),
+            ],
+            options={
+                'verbose_name': 'ledger entry',
+                'verbose_name_plural': 'ledger entries',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='ledgerentry',
+            index_together=set([('period', 'is_checked_out')]),
+        ),
+    ]
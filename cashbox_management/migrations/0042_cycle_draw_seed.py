@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashbox_management', '0041_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cycle',
+            name='draw_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cycle',
+            name='draw_weights',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
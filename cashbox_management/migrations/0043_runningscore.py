@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashbox_management', '0042_cycle_draw_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunningScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('removed', models.DateTimeField(blank=True, default=None, editable=False, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+                ('score', models.FloatField(default=0.0, verbose_name='Score')),
+                ('score_time', models.DateTimeField(blank=True, null=True, verbose_name='Score Time')),
+                ('membership', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='running_score', to='cashbox_management.Membership')),
+            ],
+            options={
+                'verbose_name': 'running score',
+                'verbose_name_plural': 'running scores',
+            },
+        ),
+    ]
@@ -1,18 +1,26 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import json
+
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction as db_transaction
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.datetime_safe import date
 from django.utils.encoding import smart_text
 from django.utils.translation import ugettext_lazy as _
 
+from cashbox_management.draw_engine import WeightedDraw, drawable_candidates, drawable_key
 from cashbox_management.models import Commission
 from cashbox_management.models import Cycle
+from cashbox_management.models.ledger import (
+    LedgerEntry,
+    get_unpaid_memberships,
+    is_period_financially_satisfied,
+)
 from cashbox_management.models.membership import Membership
 from cashbox_management.models.period import Period
 from cashbox_management.models.winner import Winner
@@ -21,6 +29,7 @@ from cashbox_management.utils import (
     get_cashbox_service_package,
     get_last_successful_order)
 from payment.models import Transaction
+from payment.querysets import cycle_transactions, period_transactions
 from utils.announce import Announce, choice as template_choice
 from utils.constants import choice
 from utils.constants.announcements import (
@@ -204,14 +213,10 @@ class Cashbox(BaseModel, BoxPermissionMixin):
 
     @property
     def owner(self):
-        if self.get_current_period() is not None:
-            return self.get_current_period().owner()
-        else:
-            periods = Period.objects.filter(cashbox=self, index=self.period_index)
-            if periods.count() == 0:
-                return None
-            else:
-                periods.first().owner()
+        period = self.get_current_period()
+        if period is None:
+            return None
+        return period.owner()
 
     @property
     def owner_name(self):
@@ -225,7 +230,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
     def remaining_days_to_draw(self):
         return (
             (
-                    self.get_current_period().get_current_cycle().draw_date - date.today()
+                    self.get_current_cycle().draw_date - date.today()
             ).days
             if self.state == choice.CASHBOX_STATE_ACTIVATED
             else 1000000
@@ -246,21 +251,16 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         # cashbox is active
         period = self.get_current_period()
         if not period.is_terminated:
-            cycles = period.cycles.all()
             # cashbox is in first period, check further constraints
-            successful_transactions = Transaction.objects.filter(
+            successful_transactions = period_transactions(
+                period,
                 destination__in=(
                     choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE,
                     choice.TRANSACTION_DST_BOX_BANKACCOUNT
                 ),
                 state=choice.TRANSACTION_STATE_SUCCESSFUL,
-                ctx_id__in=[cycle.id for cycle in cycles],
-                ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
             )
-            if successful_transactions.count() == 0:
-                return True
-            else:
-                return False
+            return not successful_transactions.exists()
         return True
 
     @property
@@ -293,8 +293,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         # last or current cycle
         result = list()
         if caller_membership is not None and caller_membership.role == choice.CASHBOX_ROLE_OWNER:
-            period = self.get_current_period()
-            current_cycle = period.get_current_cycle()
+            current_cycle = self.get_current_cycle()
             if current_cycle is not None:
                 cycles = Cycle.objects.filter(index__in=(int(current_cycle.index - 1), current_cycle.index),
                                               period__cashbox=self)
@@ -313,13 +312,122 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         return result
 
     def get_current_period(self):
+        """
+        returns the current PERIOD of the cashbox, memoized on the instance
+        the memo is keyed by period_index so changing the index invalidates it
+        """
+        cached = self.__dict__.get("_current_period_cache")
+        if cached is not None and cached[0] == self.period_index:
+            return cached[1]
+
         period = Period.objects.filter(
             cashbox=self, index=self.period_index).order_by("-created").first()
         if period is not None:
+            period.cashbox = self
+            self._current_period_cache = (self.period_index, period)
             return period
 
         return None
 
+    def get_current_cycle(self):
+        """
+        returns the current CYCLE of the current PERIOD, memoized on the instance
+        the memo is keyed by the period and its cycle_index
+        """
+        period = self.get_current_period()
+        if period is None:
+            return None
+
+        key = (period.pk, period.cycle_index)
+        cached = self.__dict__.get("_current_cycle_cache")
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        cycle = period.get_current_cycle()
+        if cycle is not None:
+            cycle.period = period
+        self._current_cycle_cache = (key, cycle)
+        return cycle
+
+    def lock_current_cycle(self):
+        """
+        locks the row of the current CYCLE until the end of the enclosing atomic block
+        and memoizes the locked instance
+        """
+        period = self.get_current_period()
+        if period is None:
+            return None
+
+        cycle = (
+            Cycle.objects.select_for_update()
+            .filter(period=period, index=period.cycle_index)
+            .first()
+        )
+        if cycle is not None:
+            cycle.period = period
+        self._current_cycle_cache = ((period.pk, period.cycle_index), cycle)
+        return cycle
+
+    def reset_current_state_cache(self):
+        """
+        drops the memoized current PERIOD and CYCLE,
+        should be called whenever the draw or cycle creation mutates them
+        """
+        self.__dict__.pop("_current_period_cache", None)
+        self.__dict__.pop("_current_cycle_cache", None)
+
+    def refresh_from_db(self, using=None, fields=None):
+        self.reset_current_state_cache()
+        super(Cashbox, self).refresh_from_db(using=using, fields=fields)
+
+    @classmethod
+    def hydrate_current_state(cls, cashboxes):
+        """
+        loads the current PERIOD, CYCLE, MEMBERSHIPs and MEMBERs of the given cashboxes
+        in a fixed number of queries and memoizes them on each cashbox
+        :param cashboxes: an iterable (or queryset) of CASHBOX objects
+        :return: the list of the hydrated cashboxes
+        """
+        cashboxes = list(cashboxes)
+        if len(cashboxes) == 0:
+            return cashboxes
+
+        periods = Period.objects.filter(
+            cashbox__in=cashboxes,
+            index=models.F("cashbox__period_index"),
+        ).prefetch_related(
+            models.Prefetch(
+                "membership_through",
+                queryset=Membership.objects.select_related("member", "share_group"),
+            )
+        ).order_by("-created")
+        current_periods = dict()
+        for period in periods:
+            # the latest created period of the index wins, like get_current_period
+            current_periods.setdefault(period.cashbox_id, period)
+
+        cycles = Cycle.objects.filter(
+            period__in=current_periods.values(),
+            index=models.F("period__cycle_index"),
+        ).order_by("-created")
+        current_cycles = dict()
+        for cycle in cycles:
+            current_cycles.setdefault(cycle.period_id, cycle)
+
+        for cashbox in cashboxes:
+            cashbox.reset_current_state_cache()
+            period = current_periods.get(cashbox.id)
+            if period is None:
+                continue
+            period.cashbox = cashbox
+            cashbox._current_period_cache = (cashbox.period_index, period)
+            cycle = current_cycles.get(period.id)
+            if cycle is not None:
+                cycle.period = period
+            cashbox._current_cycle_cache = ((period.pk, period.cycle_index), cycle)
+
+        return cashboxes
+
     def get_owner(self):
         return self.get_current_period().owner()
 
@@ -337,18 +445,24 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         """
         makes the draw done and starts a new cycle
         :param winner: a Member object, if the draw is manual and None if the draw is automatic
-        :return: None if cashbox is Inactive or the cycle is drawn, otherwise returns winner member
+        :return: None if cashbox is Inactive or the cycle could not be drawn, otherwise the winner member
         """
         if self.state == choice.CASHBOX_STATE_INACTIVATED:
             return None
 
-        cycle = self.get_current_period().get_current_cycle()
+        cycle = self.get_current_cycle()
         # handle both automatic & manual
         winner = cycle.draw(winner)
+        if winner is None:
+            # the cycle is not drawn (e.g. some shares are unpaid), so no new cycle is started
+            return None
+        # the draw resets balances and won shares of the period
+        self.reset_current_state_cache()
 
         if self.get_current_period().number_of_remained_cycles > 0:
             # there are some shares remained to win
             self.get_current_period().create_new_cycle()
+            self.reset_current_state_cache()
         else:  # all shares have been won, terminate the period
             self.state = choice.CASHBOX_STATE_INACTIVATED
 
@@ -357,8 +471,14 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         return winner
 
     def draw(
-            self, winners_count=-1, drawable_list=None, amount=-1, create_cashouts=True
+            self, winners_count=-1, drawable_list=None, amount=-1, create_cashouts=True, seed=None
     ):
+        """
+        draws several winners (memberships or share groups) of the current cycle at once
+        the winners are drawn by a WeightedDraw whose seed and weights are persisted on the cycle,
+        so the draw can be replayed through Cycle.replay_draw()
+        :param seed: the seed of the draw, a new one is generated if None
+        """
         if self.state == choice.CASHBOX_STATE_INACTIVATED:
             return None
 
@@ -376,16 +496,26 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         if winners_count in (-1, 0):
             winners_count = self.get_current_period().number_of_loans
 
+        weighted_draw = WeightedDraw(drawable_candidates(drawable_list), seed=seed)
+        drawn = weighted_draw.draw(winners_count)
+        cycle = self.get_current_cycle()
+        cycle.draw_seed = weighted_draw.seed
+        cycle.draw_weights = json.dumps(
+            [[drawable_key(drawable), weight] for drawable, weight in weighted_draw.candidates]
+        )
+        cycle.save(update_fields=["draw_seed", "draw_weights"])
+
+        # the drawn ones are exactly winners_count distinct drawables, so choose_winners picks
+        # all of them and only builds their WINNERs, the choice itself is the replayable draw above
         winners = choose_winners(
-            drawable_list=drawable_list, winners_count=winners_count, amount=amount
+            drawable_list=drawn, winners_count=winners_count, amount=amount
         )
 
         if winners is None:
             return -2
 
         if create_cashouts:
-            for winner in winners:
-                self.create_cashout_for_winner(winner=winner)
+            self.create_cashouts_for_winners(winners)
 
         return winners
 
@@ -403,13 +533,13 @@ class Cashbox(BaseModel, BoxPermissionMixin):
             return self.commission.cycle_commission
 
     def is_financially_satisfied(self):
-        return self.balance == self.get_current_period().satisfactory_amount
+        return is_period_financially_satisfied(self.get_current_period())
 
     def get_last_winners_list(self):
         return [
             winner
             for winner in Winner.objects.filter(
-                cycle=self.get_current_period().get_current_cycle()
+                cycle=self.get_current_cycle()
             )
         ]
 
@@ -430,9 +560,13 @@ class Cashbox(BaseModel, BoxPermissionMixin):
     # Balance methods
 
     def checkout_balance_and_reset(self):
+        period = self.get_current_period()
         returned_balance = self.balance
-        for membership in self.get_current_period().get_valid_memberships():
-            membership.reset_balance()
+        # one UPDATE per table instead of a save() per membership
+        LedgerEntry.checkout(period=period)
+        Membership.objects.filter(
+            period=period, is_owner_accept=True, is_member_accept=True
+        ).update(percentage_balance=0)
         self.save()
         return returned_balance
 
@@ -446,80 +580,123 @@ class Cashbox(BaseModel, BoxPermissionMixin):
             state=choice.TRANSACTION_STATE_INIT,
             send_sms=False,
     ):
-        if amount > self.balance:
+        cashouts = self.create_cashouts(
+            [(member, amount)], account=account, state=state, send_sms=send_sms
+        )
+        if cashouts is None:
+            return None
+        return cashouts[0]
+
+    def create_cashouts(
+            self,
+            member_amounts,
+            account=None,
+            state=choice.TRANSACTION_STATE_INIT,
+            send_sms=False,
+    ):
+        """
+        creates the cashout TRANSACTIONs of several members in one atomic block
+        the balance, the current cycle and the owner are resolved once for the whole batch
+        :param member_amounts: a list of (member, amount) pairs
+        :param account: the bank account of the cashouts if any
+        :param state: the initial state of the cashouts
+        :param send_sms: whether to announce the cashouts to their receivers or not
+        :return: the list of created TRANSACTIONs or None if the batch is not valid
+        """
+        if sum(amount for _, amount in member_amounts) > self.balance:
             error_logger.error(smart_text(self.name))
             error_logger.error("amount is bigger than cashout balance")
 
             return None
 
-        if member is None:
+        if any(member is None for member, _ in member_amounts):
             error_logger.error(smart_text(smart_text(self.name)))
             error_logger.error("Member is None")
 
             return None
 
-        # remaining = amount
-
-        # for m in self.get_current_period().get_valid_memberships():
-        #     if remaining == 0:
-        #         break
-        #     if m.balance >= remaining:
-        #         m.withdraw_balance(remaining)
-        #         remaining = 0
-        #         break
-
-        #     remaining -= m.balance
-        # m.reset_balance()
-
-        trans = Transaction.objects.create(
-            source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
-            destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT,
-            ctx_id=self.get_current_period().get_current_cycle().id,
-            ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
-            payer=self.get_owner(),
-            receiver=member,
-            amount=amount,
-            bank_account=account,
-            state=state,
-        )
+        cycle_id = self.get_current_cycle().id
+        owner = self.get_owner()
+        with db_transaction.atomic():
+            # the rows are created one by one since MySQL does not return the ids of
+            # bulk_create and the cashout web keys are assigned on save
+            cashouts = [
+                Transaction.objects.create(
+                    source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
+                    destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT,
+                    ctx_id=cycle_id,
+                    ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+                    payer=owner,
+                    receiver=member,
+                    amount=amount,
+                    bank_account=account,
+                    state=state,
+                )
+                for member, amount in member_amounts
+            ]
 
         if send_sms:
-            trans.send_cashout_process_announcement_message()
-            trans.send_cashout_process_announcement_sms()
+            for trans in cashouts:
+                trans.send_cashout_process_announcement_message()
+                trans.send_cashout_process_announcement_sms()
 
-        return trans
+        return cashouts
 
-    def create_cashout_for_winner(
-            self, winner, state=choice.TRANSACTION_STATE_INIT, send_sms=False
-    ):
+    @staticmethod
+    def get_winner_member_amounts(winner):
+        """
+        the (member, amount) pairs of the cashouts of a WINNER, one for a complete share or one per
+        MEMBERSHIP of the share group
+        :return: the list of the pairs or None if the winner is not valid
+        """
         if winner.membership is not None and winner.share_group is None:
             # winner is a membership and have a complete share
-            return self.create_cashout(
-                amount=winner.loan_amount,
-                state=state,
-                send_sms=send_sms,
-                member=winner.member,
-            )
-        elif winner.membership is None and winner.share_group is not None:
+            return [(winner.member, winner.loan_amount)]
+        if winner.membership is None and winner.share_group is not None:
             # winner is a share group and loan amount should be divided
-            number_of_creation = 0
-            for membership in winner.share_group.memberships.all():
-                amount = (
-                        winner.loan_amount
-                        * membership.share_residue
-                        / winner.cycle.period.share_value
+            share_value = winner.cycle.period.share_value
+            member_amounts = [
+                (
+                    membership.member,
+                    winner.loan_amount * membership.share_residue / share_value,
                 )
-                if self.create_cashout(
-                        amount=amount,
-                        member=membership.member,
-                        state=state,
-                        send_sms=send_sms,
-                ):
-                    number_of_creation += 1
-            return number_of_creation == winner.share_group.number_of_portions
-
+                for membership in winner.share_group.memberships.select_related(
+                    "member"
+                )
+            ]
+            if len(member_amounts) != winner.share_group.number_of_portions:
+                error_logger.error("share group portions do not match its memberships")
+                return None
+            return member_amounts
         # some error in assigning occurs
-        return False
+        return None
+
+    def create_cashout_for_winner(
+            self, winner, state=choice.TRANSACTION_STATE_INIT, send_sms=False
+    ):
+        """
+        creates the cashouts of a WINNER
+        :return: the list of created TRANSACTIONs or None if nothing is created
+        """
+        return self.create_cashouts_for_winners([winner], state=state, send_sms=send_sms)
+
+    def create_cashouts_for_winners(
+            self, winners, state=choice.TRANSACTION_STATE_INIT, send_sms=False
+    ):
+        """
+        creates the cashouts of all the WINNERs as one atomic batch
+        the winners which are not valid are skipped
+        :return: the list of created TRANSACTIONs or None if nothing is created
+        """
+        member_amounts = []
+        for winner in winners:
+            winner_member_amounts = self.get_winner_member_amounts(winner)
+            if winner_member_amounts is not None:
+                member_amounts.extend(winner_member_amounts)
+        if len(member_amounts) == 0:
+            return None
+
+        return self.create_cashouts(member_amounts, state=state, send_sms=send_sms)
 
     def charge_bank_balance(self, amount):
         return self.get_current_period().charge_bank_balance(amount)
@@ -528,7 +705,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         return self.get_current_period().discharge_bank_balance(amount)
 
     def can_change_trust_state(self):
-        cycle = self.get_current_period().get_current_cycle()
+        cycle = self.get_current_cycle()
         if cycle is not None:
             return not Transaction.objects.filter(ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE, ctx_id=cycle.id,
                                                   state=choice.TRANSACTION_STATE_SUCCESSFUL).exists()
@@ -537,46 +714,67 @@ class Cashbox(BaseModel, BoxPermissionMixin):
     # Messaging Helper methods
 
     def get_notification_members(self):
+        return self.load_members(self.get_announcement_member_ids(self.notification_announce))
+
+    def get_sms_members(self):
+        return self.load_members(self.get_announcement_member_ids(self.sms_announce))
+
+    def get_announcement_member_ids(self, announce_mode):
+        """
+        the ids of the members which should receive the announcements of the current PERIOD
+        :param announce_mode: the announcement mode of the channel (notification_announce or sms_announce)
+        :return: a set of member ids
+        """
         if self.is_archived:
-            return []
-        if self.notification_announce == choice.ANNOUNCEMENT_MODE_SILENT:
-            return []
+            return set()
+        if announce_mode == choice.ANNOUNCEMENT_MODE_SILENT:
+            return set()
 
-        if self.notification_announce == choice.ANNOUNCEMENT_MODE_JUST_OWNER:
-            return [
-                membership.member
-                for membership in Membership.objects.filter(
-                    period=self.get_current_period(), role="own"
-                )
-            ]
+        memberships = Membership.objects.filter(period=self.get_current_period())
+        if announce_mode == choice.ANNOUNCEMENT_MODE_JUST_OWNER:
+            memberships = memberships.filter(role=choice.CASHBOX_ROLE_OWNER)
+        return set(memberships.values_list("member_id", flat=True))
 
-        return [
-            membership.member
-            for membership in Membership.objects.filter(
-                period=self.get_current_period()
-            )
-        ]
+    def get_valid_member_ids(self):
+        """
+        the ids of the members of the valid MEMBERSHIPs of the current PERIOD
+        """
+        return set(
+            Membership.objects.filter(
+                period=self.get_current_period(),
+                is_owner_accept=True,
+                is_member_accept=True,
+            ).values_list("member_id", flat=True)
+        )
 
-    def get_sms_members(self):
-        if self.is_archived:
-            return []
-        if self.sms_announce == choice.ANNOUNCEMENT_MODE_SILENT:
-            return []
+    @staticmethod
+    def get_winner_member_ids(winners):
+        """
+        the ids of the members which are won, either by a complete share or through a share group
+        """
+        member_ids = set()
+        for winner in winners:
+            if winner.winner_type == "membership":
+                member_ids.add(winner.member.pk)
+            elif winner.winner_type == "share_group":
+                member_ids.update(winner_member.pk for winner_member in winner.members)
+        return member_ids
 
-        if self.sms_announce == choice.ANNOUNCEMENT_MODE_JUST_OWNER:
-            return [
-                membership.member
-                for membership in Membership.objects.filter(
-                    period=self.get_current_period(), role="own"
-                )
-            ]
+    def get_non_winner_members(self, winners):
+        """
+        the valid members of the current PERIOD except the winners, loaded with one query
+        """
+        return self.load_members(
+            self.get_valid_member_ids() - self.get_winner_member_ids(winners)
+        )
 
-        return [
-            membership.member
-            for membership in Membership.objects.filter(
-                period=self.get_current_period()
-            )
-        ]
+    @staticmethod
+    def load_members(member_ids):
+        from account_management.models.member import Member
+
+        if len(member_ids) == 0:
+            return []
+        return list(Member.objects.filter(id__in=member_ids))
 
     def update_trust_state(self, state=None):
         if state is None:
@@ -625,8 +823,8 @@ class Cashbox(BaseModel, BoxPermissionMixin):
     def send_pay_reminder_messages(self):
         if self.is_archived:
             return None
-        if (self.get_current_period().get_current_cycle()
-                and self.get_current_period().get_current_cycle().is_drawn):
+        if (self.get_current_cycle()
+                and self.get_current_cycle().is_drawn):
             # the current cycle is already drawn and finished
             return None
 
@@ -675,16 +873,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
             message_body = msg.CYCLE_WINNER_NAMED_ANNOUNCEMENT_MSG.format(
                 winning_cycle_index, self.name, draw_text, winners[0].name
             )
-        other_members = self.get_current_period().get_valid_members()
-
-        for winner in winners:
-            if winner.winner_type == "membership":
-                if other_members.__contains__(winner.member):
-                    other_members.remove(winner.member)
-            elif winner.winner_type == "share_group":
-                for winner_member in winner.members:
-                    if other_members.__contains__(winner_member):
-                        other_members.remove(winner_member)
+        other_members = self.get_non_winner_members(winners)
 
         if len(other_members) == 0:
             return
@@ -816,19 +1005,17 @@ class Cashbox(BaseModel, BoxPermissionMixin):
             return None
         if self.notification_announce == choice.ANNOUNCEMENT_MODE_SILENT:
             return None
-        if (self.get_current_period().get_current_cycle()
-                and self.get_current_period().get_current_cycle().is_drawn):
+        if (self.get_current_cycle()
+                and self.get_current_cycle().is_drawn):
             # the current cycle is already drawn and finished
             return None
 
         if self.notification_announce == choice.ANNOUNCEMENT_MODE_JUST_OWNER:
             target_members = [
                 membership.member
-                for membership in Membership.objects.filter(
-                    period=self.get_current_period(),
-                    role=choice.CASHBOX_ROLE_OWNER
-                )
-                if membership.balance < membership.share_amount
+                for membership in get_unpaid_memberships(
+                    self.get_current_period(), role=choice.CASHBOX_ROLE_OWNER
+                ).select_related("member")
             ]
         else:
             target_members = self.get_current_period().get_unpaid_members()
@@ -881,16 +1068,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
                 winning_cycle_index, self.name, draw_text, winners[0].name
             )
 
-        other_members = self.get_current_period().get_valid_members()
-
-        for winner in winners:
-            if winner.winner_type == "membership":
-                if other_members.__contains__(winner.member):
-                    other_members.remove(winner.member)
-            elif winner.winner_type == "share_group":
-                for winner_member in winner.members:
-                    if other_members.__contains__(winner_member):
-                        other_members.remove(winner_member)
+        other_members = self.get_non_winner_members(winners)
 
         if len(other_members) == 0:
             return
@@ -1034,16 +1212,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         elif draw_type == choice.DRAW_SEMI_AUTOMATIC:
             draw_text = DRAW_TYPE_SEMI_AUTOMATIC
 
-        members = self.get_current_period().get_valid_members()
-
-        for winner in winners:
-            if winner.winner_type == 'membership':
-                if members.__contains__(winner.member):
-                    members.remove(winner.member)
-            elif winner.winner_type == 'share_group':
-                for winner_member in winner.members:
-                    if members.__contains__(winner_member):
-                        members.remove(winner_member)
+        members = self.get_non_winner_members(winners)
         winners_name = winners[0].name
         if len(winners) > 1:
             winners_name = list_winners_to_string(winners)
@@ -1138,30 +1307,25 @@ class Cashbox(BaseModel, BoxPermissionMixin):
     def send_pay_reminder_sms(self):
         if self.is_archived or self.is_test or not self.has_perm(choice.FEATURE_SMS_ANNOUNCEMENT):
             return None
-        if (self.get_current_period().get_current_cycle()
-                and self.get_current_period().get_current_cycle().is_drawn):
+        if (self.get_current_cycle()
+                and self.get_current_cycle().is_drawn):
             # the current cycle is already drawn and finished
             return None
         if self.sms_announce == choice.ANNOUNCEMENT_MODE_SILENT:
             return
 
         if self.sms_announce == choice.ANNOUNCEMENT_MODE_JUST_OWNER:
-            members = [
-                membership
-                for membership in Membership.objects.filter(
-                    period=self.get_current_period(),
-                    role=choice.CASHBOX_ROLE_OWNER
-                )
-                if membership.balance < membership.share_amount
-            ]
+            members = list(
+                get_unpaid_memberships(
+                    self.get_current_period(), role=choice.CASHBOX_ROLE_OWNER
+                ).select_related("member")
+            )
         else:
-            members = [
-                membership
-                for membership in Membership.objects.filter(
-                    period=self.get_current_period()
-                )
-                if membership.balance < membership.share_amount
-            ]
+            members = list(
+                get_unpaid_memberships(
+                    self.get_current_period()
+                ).select_related("member")
+            )
         if len(members) == 0:
             return
 
@@ -1192,6 +1356,10 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         elif draw_type == choice.DRAW_SEMI_AUTOMATIC:
             draw_text = DRAW_TYPE_SEMI_AUTOMATIC
         cycles = self.get_current_period().cycles.filter(index=winning_cycle_index)
+        winning_cycle_transactions = cycle_transactions(
+            cycles,
+            source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
+        )
         for winner in winners:
             if winner.winner_type == "membership":
                 if (
@@ -1200,12 +1368,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
                 ):
                     continue
 
-                ts = Transaction.objects.filter(
-                    receiver=winner.member,
-                    source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
-                    ctx_id__in=[cycle.id for cycle in cycles],
-                    ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
-                )
+                ts = winning_cycle_transactions.filter(receiver=winner.member)
                 if ts.count() == 0:
                     send_high_priority_templated_sms.delay(
                         phone_number=winner.phone_number,
@@ -1229,12 +1392,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
                     )
             elif winner.winner_type == "share_group":
                 for winner_member in winner.members:
-                    ts = Transaction.objects.filter(
-                        receiver=winner_member,
-                        source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
-                        ctx_id__in=[cycle.id for cycle in cycles],
-                        ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
-                    )
+                    ts = winning_cycle_transactions.filter(receiver=winner_member)
                     if ts.count() == 0:
                         send_high_priority_templated_sms.delay(
                             phone_number=winner_member.phone_number,
@@ -1271,15 +1429,7 @@ class Cashbox(BaseModel, BoxPermissionMixin):
             draw_text = DRAW_TYPE_AUTOMATIC
         elif draw_type == choice.DRAW_SEMI_AUTOMATIC:
             draw_text = DRAW_TYPE_SEMI_AUTOMATIC
-        other_members = self.get_current_period().get_valid_members()
-        for winner in winners:
-            if winner.winner_type == "membership":
-                if other_members.__contains__(winner.member):
-                    other_members.remove(winner.member)
-            elif winner.winner_type == "share_group":
-                for winner_member in winner.members:
-                    if other_members.__contains__(winner_member):
-                        other_members.remove(winner_member)
+        other_members = self.get_non_winner_members(winners)
         if len(other_members) == 0:
             return
 
@@ -1314,16 +1464,15 @@ class Cashbox(BaseModel, BoxPermissionMixin):
         return self.short_url
 
 
-@receiver(post_save, sender=Cashbox)
+@receiver(pre_save, sender=Cashbox)
 def assign_web_key(sender, instance, **kwargs):
     if instance.web_key is None or instance.web_key == "":
         instance.web_key = generate_alphanumeric_uid(settings.CASHBOX_WEB_KEY_LENGTH)
-        instance.save()
 
 
 @receiver(post_save, sender=Cashbox)
-def create_commission(sender, instance, **kwargs):
-    commissions = Commission.all_objects.filter(cashbox=instance).first()
-    if commissions is None:
-        commission = Commission.objects.create(cashbox=instance)
-        commission.save()
+def create_commission(sender, instance, created, **kwargs):
+    if not created:
+        return
+    if not Commission.all_objects.filter(cashbox=instance).exists():
+        Commission.objects.create(cashbox=instance)
@@ -1,10 +1,12 @@
-import random
+import json
 
 from django.db import models
 from django.utils.datetime_safe import date
 from django.utils.translation import ugettext_lazy as _
 from khayyam import JalaliDate
 
+from cashbox_management.draw_engine import WeightedDraw, membership_candidates
+from cashbox_management.models.ledger import get_unpaid_memberships
 from cashbox_management.models.membership import Membership
 from cashbox_management.models.winner import Winner
 from payment.models.transaction import Transaction
@@ -37,6 +39,9 @@ class Cycle(BaseModel):
     draw_date: the date which draw will occur in it
     drawing_date: the actual drawing date
     is_manually_drawn: an indicator says whether it is drawn manually or not
+    draw_seed: the seed of the automatic draw which makes the draw replayable
+    draw_weights: the JSON snapshot of the [member id, weight] candidates of the automatic draw
+        (or of the [[model name, id], weight] drawables of a multi-winner draw)
     period: the PERIOD object which contains this cycle
     winner: the winner MEMBER object of the cycle if it's drawn (DEPRECATED)
     """
@@ -47,6 +52,8 @@ class Cycle(BaseModel):
     # the drawing date which the draw actually happened
     drawing_date = models.DateField(null=True, blank=True)
     is_manually_drawn = models.BooleanField(default=False, blank=True)
+    draw_seed = models.BigIntegerField(null=True, blank=True)
+    draw_weights = models.TextField(default="", blank=True)
     period = models.ForeignKey(
         "cashbox_management.Period", on_delete=models.CASCADE, related_name="cycles"
     )
@@ -100,14 +107,14 @@ class Cycle(BaseModel):
     def is_in_period(self, period):
         return self in period.cycles
 
-    def draw(self, winner=None):
+    def draw(self, winner=None, seed=None):
         if self.winner is not None:
             # the winner already chosen
             return None
         if not self.cashbox.is_financially_satisfied():
             # the cashbox is not financially satisfied
             return None
-        if len(self.period.get_unpaid_memberships()) > 0:
+        if get_unpaid_memberships(self.period).exists():
             # some members may not pay their shares completely
             return None
 
@@ -119,11 +126,14 @@ class Cycle(BaseModel):
                 winner = self.cashbox.get_owner()
                 self.is_manually_drawn = True
             else:
-                total_member_chances = []
-                for membership in memberships:
-                    for i in range(0, membership.non_won_shares):
-                        total_member_chances.append(membership.member)
-                winner = random.choice(seq=total_member_chances)
+                weighted_draw = WeightedDraw(
+                    membership_candidates(memberships), seed=seed
+                )
+                winner = weighted_draw.draw()[0]
+                self.draw_seed = weighted_draw.seed
+                self.draw_weights = json.dumps(
+                    [[member.id, weight] for member, weight in weighted_draw.candidates]
+                )
                 self.is_manually_drawn = False
         else:
             # draw is manual
@@ -139,6 +149,18 @@ class Cycle(BaseModel):
 
         return self.winner
 
+    def replay_draw(self, winners_count=1):
+        """
+        draws the automatic draw of the cycle again out of its persisted seed and weights,
+        so it does not depend on the current shares of the memberships
+        :param winners_count: the number of the winners of the draw, more than one for Cashbox.draw()
+        :return: the list of the winners, the member ids of a cycle draw or the [model name, id] keys
+            of the memberships and share groups of a Cashbox.draw(), None if not drawn automatically
+        """
+        if self.draw_seed is None or not self.draw_weights:
+            return None
+        return WeightedDraw(json.loads(self.draw_weights), seed=self.draw_seed).draw(winners_count)
+
     def rollback_winner(self):
         if self.winner is not None:
             rolledback_membership = Membership.objects.filter(
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import models
+from django.db.models import (
+    Case,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+from django.dispatch.dispatcher import receiver
+from django.utils.translation import ugettext_lazy as _
+
+from payment.models import Transaction
+from utils.constants import choice
+from utils.models import BaseModel
+
+LEDGER_BACKFILL_CHUNK_SIZE = 5000
+LEDGER_PAYMENT_SOURCES = (choice.TRANSACTION_SRC_GATEWAY, choice.TRANSACTION_SRC_HAMYAN_WALLET)
+LEDGER_PAYMENT_DESTINATIONS = (
+    choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE,
+    choice.TRANSACTION_DST_BOX_BANKACCOUNT,
+)
+
+
+def is_ledger_enabled():
+    """
+    whether the balances are read from the ledger, which is turned on (LEDGER_BALANCES_ENABLED)
+    once the backfill_ledger command has replayed the history, till then the legacy
+    percentage_balance is read while the ledger keeps being appended
+    """
+    return getattr(settings, "LEDGER_BALANCES_ENABLED", False)
+
+
+class LedgerEntry(BaseModel):
+    """
+    the append-only ledger of the paid amounts of the MEMBERSHIPs in a PERIOD
+    each successful cycle TRANSACTION appends exactly one entry and a draw checks out
+    all open entries of the PERIOD with a single UPDATE
+
+    FIELDS
+    period: the PERIOD which the entry is belonged
+    membership: the MEMBERSHIP which the amount is paid for
+    transaction: the successful TRANSACTION which the entry is appended for
+    amount: the paid amount in Tomans
+    is_checked_out: the indicator says whether the entry is checked out by a draw or not
+    """
+    period = models.ForeignKey(
+        "cashbox_management.Period",
+        on_delete=models.CASCADE,
+        related_name="ledger_entries",
+    )
+    membership = models.ForeignKey(
+        "cashbox_management.Membership",
+        on_delete=models.CASCADE,
+        related_name="ledger_entries",
+    )
+    transaction = models.OneToOneField(
+        "payment.Transaction",
+        on_delete=models.SET_NULL,
+        related_name="ledger_entry",
+        null=True,
+        blank=True,
+    )
+    amount = models.IntegerField(_("Amount"), default=0)
+    is_checked_out = models.BooleanField(_("Is Checked Out"), default=False)
+
+    class Meta:
+        verbose_name = _("ledger entry")
+        verbose_name_plural = _("ledger entries")
+        index_together = (("period", "is_checked_out"),)
+
+    def __str__(self):
+        return "(%s)>>%s" % (str(self.amount), self.membership.__str__())
+
+    @classmethod
+    def open_balance(cls, **filters):
+        """
+        the sum of the not checked out entries which match the filters
+        """
+        return cls.objects.filter(is_checked_out=False, **filters).aggregate(
+            balance=Coalesce(Sum("amount"), 0)
+        )["balance"]
+
+    @classmethod
+    def checkout(cls, **filters):
+        """
+        checks out all open entries which match the filters in one UPDATE
+        """
+        return cls.objects.filter(is_checked_out=False, **filters).update(
+            is_checked_out=True
+        )
+
+
+def legacy_paid_amount():
+    """
+    the legacy paid amount of a MEMBERSHIP as a subquery: the sum of its successful payments to the
+    current CYCLE of its PERIOD, which is what the legacy balance holds since the last draw
+    it expects the membership to be annotated with its current cycle id (legacy_cycle_id)
+    """
+    payments = (
+        Transaction.objects.filter(
+            ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+            ctx_id=OuterRef("legacy_cycle_id"),
+            receiver_id=OuterRef("member_id"),
+            state=choice.TRANSACTION_STATE_SUCCESSFUL,
+            is_group_pay=False,
+            source__in=LEDGER_PAYMENT_SOURCES,
+            destination__in=LEDGER_PAYMENT_DESTINATIONS,
+        )
+        .order_by()
+        .values("receiver_id")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    return Coalesce(Subquery(payments, output_field=IntegerField()), 0)
+
+
+def annotate_paid_amount(memberships, from_ledger=None):
+    """
+    annotates the open paid amount (paid_amount) and the total share amount (due_amount)
+    of each MEMBERSHIP of the queryset
+    :param from_ledger: whether to sum the open ledger entries or the legacy cycle payments,
+        is_ledger_enabled() if None
+    """
+    from cashbox_management.models.cycle import Cycle
+
+    if from_ledger is None:
+        from_ledger = is_ledger_enabled()
+    due_amount = ExpressionWrapper(
+        F("number_of_shares") * F("period__share_value") + Coalesce(F("share_residue"), 0),
+        output_field=IntegerField(),
+    )
+    if not from_ledger:
+        current_cycles = Cycle.objects.filter(
+            period_id=OuterRef("period_id"), index=OuterRef("period__cycle_index")
+        ).order_by("-created")
+        return memberships.annotate(
+            legacy_cycle_id=Subquery(current_cycles.values("id")[:1], output_field=IntegerField())
+        ).annotate(paid_amount=legacy_paid_amount(), due_amount=due_amount)
+    return memberships.annotate(
+        paid_amount=Coalesce(
+            Sum(
+                Case(
+                    When(
+                        ledger_entries__is_checked_out=False,
+                        then=F("ledger_entries__amount"),
+                    ),
+                    default=0,
+                    output_field=IntegerField(),
+                )
+            ),
+            0,
+        ),
+        due_amount=due_amount,
+    )
+
+
+def get_unpaid_memberships(period, **filters):
+    """
+    the valid MEMBERSHIPs of the PERIOD which have not paid their share amount completely,
+    answered by one aggregate query
+    """
+    from cashbox_management.models.membership import Membership
+
+    memberships = Membership.objects.filter(
+        period=period, is_owner_accept=True, is_member_accept=True, **filters
+    )
+    return annotate_paid_amount(memberships).filter(paid_amount__lt=F("due_amount"))
+
+
+def is_period_financially_satisfied(period):
+    """
+    whether all valid MEMBERSHIPs of the PERIOD have paid their share amount completely
+    """
+    return period is not None and not get_unpaid_memberships(period).exists()
+
+
+def replay_cycle_payments(chunk_size=LEDGER_BACKFILL_CHUNK_SIZE):
+    """
+    appends a checked out entry for each historical successful cycle payment which has no entry yet,
+    walking the transactions by id in chunks, the open part of the balances is opened by
+    open_legacy_balances()
+    :return: the count of the appended entries
+    """
+    from cashbox_management.models.membership import Membership
+
+    memberships = Membership.objects.filter(
+        period__cycles__id=OuterRef("ctx_id"), member_id=OuterRef("receiver_id")
+    )
+    payments = Transaction.objects.filter(
+        ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+        state=choice.TRANSACTION_STATE_SUCCESSFUL,
+        is_group_pay=False,
+        receiver__isnull=False,
+        source__in=LEDGER_PAYMENT_SOURCES,
+        destination__in=LEDGER_PAYMENT_DESTINATIONS,
+        ledger_entry__isnull=True,
+    ).annotate(
+        ledger_membership_id=Subquery(memberships.values("id")[:1], output_field=IntegerField()),
+        ledger_period_id=Subquery(
+            memberships.values("period_id")[:1], output_field=IntegerField()
+        ),
+    )
+
+    count = 0
+    last_transaction_id = 0
+    while True:
+        chunk = list(
+            payments.filter(id__gt=last_transaction_id)
+            .order_by("id")
+            .values_list("id", "ledger_membership_id", "ledger_period_id", "amount")[:chunk_size]
+        )
+        if len(chunk) == 0:
+            break
+        last_transaction_id = chunk[-1][0]
+        entries = LedgerEntry.objects.bulk_create(
+            [
+                LedgerEntry(
+                    transaction_id=transaction_id,
+                    membership_id=membership_id,
+                    period_id=period_id,
+                    amount=amount,
+                    is_checked_out=True,
+                )
+                for transaction_id, membership_id, period_id, amount in chunk
+                if membership_id is not None
+            ]
+        )
+        count += len(entries)
+    return count
+
+
+def open_legacy_balances(chunk_size=LEDGER_BACKFILL_CHUNK_SIZE):
+    """
+    appends an open entry to each valid MEMBERSHIP for the difference of its legacy balance and
+    its open ledger balance, so the ledger starts from the current balances
+    it only appends the differences, so rerunning it corrects the payments of a concurrent run
+    :return: the count of the appended entries
+    """
+    from cashbox_management.models.membership import Membership
+
+    memberships = annotate_paid_amount(
+        Membership.objects.filter(is_owner_accept=True, is_member_accept=True), from_ledger=True
+    ).select_related("period").order_by("id")
+
+    count = 0
+    last_membership_id = 0
+    while True:
+        chunk = list(memberships.filter(id__gt=last_membership_id)[:chunk_size])
+        if len(chunk) == 0:
+            break
+        last_membership_id = chunk[-1].id
+        entries = LedgerEntry.objects.bulk_create(
+            [
+                LedgerEntry(
+                    period_id=membership.period_id,
+                    membership=membership,
+                    amount=membership.legacy_balance - membership.paid_amount,
+                )
+                for membership in chunk
+                if membership.legacy_balance != membership.paid_amount
+            ]
+        )
+        count += len(entries)
+    return count
+
+
+@receiver(post_save, sender=Transaction)
+def append_cycle_payment(sender, instance, **kwargs):
+    if (
+            instance.ctx_type != choice.TRANSACTION_CTX_TYPE_CYCLE
+            or instance.state != choice.TRANSACTION_STATE_SUCCESSFUL
+            or instance.is_group_pay
+            or instance.receiver_id is None
+            or instance.source not in LEDGER_PAYMENT_SOURCES
+            or instance.destination not in LEDGER_PAYMENT_DESTINATIONS
+    ):
+        return
+
+    from cashbox_management.models.membership import Membership
+
+    membership = Membership.objects.filter(
+        period__cycles__id=instance.ctx_id, member_id=instance.receiver_id
+    ).first()
+    if membership is None:
+        return
+
+    # the transaction is one-to-one with its entry, so re-saves never credit twice
+    LedgerEntry.objects.get_or_create(
+        transaction=instance,
+        defaults={
+            "period_id": membership.period_id,
+            "membership": membership,
+            "amount": instance.amount,
+        },
+    )
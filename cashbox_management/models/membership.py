@@ -3,13 +3,14 @@ from __future__ import unicode_literals
 
 from django.conf import settings
 from django.db import models
-from django.db.models import Q
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
 from django.dispatch.dispatcher import receiver
 from django.utils.translation import ugettext_lazy as _
 
 from cashbox_management.models.commission import Commission
-from payment.models import Transaction
+from cashbox_management.models.ledger import LedgerEntry, is_ledger_enabled
+from cashbox_management.models.running_score import RunningScore  # noqa: F401
+from payment.querysets import cycle_transactions, period_transactions
 from utils.constants import choice
 from utils.constants.default import WEB_APP_BASE_URL, WEB_DOWNLOAD_LINK
 from utils.constants.notification_constant import (
@@ -142,7 +143,7 @@ class Membership(BaseModel):
     def cashout_state(self):
         cashouts = self.get_cashouts()
         if cashouts is not None:
-            if cashouts.count() > 1:
+            if len(cashouts) > 1:
                 init_cashouts = [
                     init_cashout
                     for init_cashout in cashouts
@@ -154,7 +155,7 @@ class Membership(BaseModel):
                     return choice.TRANSACTION_STATE_IN_PROGRESS
                 else:
                     return cashouts[0].state
-            elif cashouts.count() > 0:
+            elif len(cashouts) > 0:
                 if cashouts[0].state != choice.TRANSACTION_STATE_TO_BANK:
                     return cashouts[0].state
                 return choice.TRANSACTION_STATE_IN_PROGRESS
@@ -165,7 +166,7 @@ class Membership(BaseModel):
     def cashout_amount(self):
         cashouts = self.get_cashouts()
         if cashouts is not None:
-            if cashouts.count() > 1:
+            if len(cashouts) > 1:
                 init_cashouts = [
                     init_cashout
                     for init_cashout in cashouts
@@ -175,7 +176,7 @@ class Membership(BaseModel):
                     return init_cashouts[0].amount
                 else:
                     return cashouts[0].amount
-            elif cashouts.count() > 0:
+            elif len(cashouts) > 0:
                 return cashouts[0].amount
 
         return 0
@@ -223,7 +224,7 @@ class Membership(BaseModel):
 
     @property
     def is_financially_satisfied(self):
-        return self.balance == self.share_amount
+        return self.calculate_remaining_share() == 0
 
     @property
     def non_won_shares(self):
@@ -244,9 +245,17 @@ class Membership(BaseModel):
             else None
         )
 
-    # TODO
     @property
     def balance(self):
+        if hasattr(self, "paid_amount"):
+            # already annotated through ledger.annotate_paid_amount()
+            return self.paid_amount
+        if not is_ledger_enabled():
+            return self.legacy_balance
+        return LedgerEntry.open_balance(membership=self)
+
+    @property
+    def legacy_balance(self):
         return int(round(self.percentage_balance * self.period.balance))
 
     @property
@@ -284,48 +293,73 @@ class Membership(BaseModel):
     # Score & Credit methods
 
     def calculate_local_score(self, origin_date, attenuator, alpha, days_factor):
-        cycles = self.period.cycles.all()
-        all_successful_transactions = Transaction.objects.filter(
+        all_successful_transactions = cycle_transactions(
+            self.period.cycles.all(),
             state=choice.TRANSACTION_STATE_SUCCESSFUL,
             receiver=self.member,
-            ctx_id__in=[cycle.id for cycle in cycles],
-            ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
             state_time__lte=date_to_datetime(origin_date),
         )
+        from cashbox_management.scoring import decayed_amount, elapsed_days
+
         membership_score = 0
         for tr in all_successful_transactions:
-            delta_date = (
-                origin_date - date_to_datetime(tr.state_time).replace(tzinfo=None)
-            ).days
+            delta_date = elapsed_days(origin_date, tr.state_time)
             if tr.source in (choice.TRANSACTION_SRC_GATEWAY, choice.TRANSACTION_SRC_HAMYAN_WALLET):
-                membership_score += (
-                    tr.amount / attenuator * (1 + alpha) ** (delta_date / days_factor)
+                membership_score += decayed_amount(
+                    tr.amount, delta_date, attenuator, alpha, days_factor
                 )
             elif tr.destination == choice.TRANSACTION_DST_MEMBER_BANKACCOUNT:
-                membership_score -= (
-                    tr.amount / attenuator * (1 + alpha) ** (delta_date / days_factor)
+                membership_score -= decayed_amount(
+                    tr.amount, delta_date, attenuator, alpha, days_factor
                 )
         return membership_score
 
     # Balance methods
 
-    def get_cashouts(self):
-        for cycle in self.period.cycles.all():
-            cashouts = Transaction.objects.filter(
-                Q(source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE)
-                & (
-                    Q(state=choice.TRANSACTION_STATE_INIT)
-                    | Q(state=choice.TRANSACTION_STATE_IN_PROGRESS)
-                    | Q(state=choice.TRANSACTION_STATE_TO_BANK)
-                )
-                & Q(destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT)
-                & Q(ctx_id=cycle.id)
-                & Q(ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE)
-                & Q(receiver=self.member)
+    @classmethod
+    def attach_cashouts(cls, memberships):
+        """
+        loads the open cashouts of the MEMBERSHIPs of a PERIOD with one query and attaches them
+        to each MEMBERSHIP, so cashout_state, cashout_amount and have_cashout do not query again
+        :param memberships: an iterable of MEMBERSHIPs of the same PERIOD
+        :return: the list of the MEMBERSHIPs
+        """
+        memberships = list(memberships)
+        if len(memberships) == 0:
+            return memberships
+
+        cashouts = period_transactions(
+            memberships[0].period_id,
+            source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
+            destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT,
+            state__in=(
+                choice.TRANSACTION_STATE_INIT,
+                choice.TRANSACTION_STATE_IN_PROGRESS,
+                choice.TRANSACTION_STATE_TO_BANK,
+            ),
+            receiver_id__in=[membership.member_id for membership in memberships],
+        ).order_by("ctx_id", "state")
+
+        # each receiver keeps only the cashouts of its first cycle which has any
+        cashout_index = dict()
+        for cashout in cashouts:
+            cycle_id, receiver_cashouts = cashout_index.setdefault(
+                cashout.receiver_id, (cashout.ctx_id, [])
             )
-            if cashouts.count() > 0:
-                return cashouts.order_by("state")
-        return None
+            if cycle_id == cashout.ctx_id:
+                receiver_cashouts.append(cashout)
+
+        for membership in memberships:
+            index_entry = cashout_index.get(membership.member_id)
+            membership._cashouts_cache = (
+                index_entry[1] if index_entry is not None else None
+            )
+        return memberships
+
+    def get_cashouts(self):
+        if not hasattr(self, "_cashouts_cache"):
+            Membership.attach_cashouts([self])
+        return self._cashouts_cache
 
     def get_cashout(self):
         cashouts = self.get_cashouts()
@@ -342,6 +376,7 @@ class Membership(BaseModel):
 
     def reset_balance(self, destination=choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE):
         current_balance = self.balance
+        LedgerEntry.checkout(membership=self)
         self.percentage_balance = 0
         self.save()
         if destination == choice.TRANSACTION_DST_BOX_BANKACCOUNT:
@@ -352,6 +387,7 @@ class Membership(BaseModel):
 
     def reset(self, destination=choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE):
         current_balance = self.balance
+        LedgerEntry.checkout(membership=self)
         self.percentage_balance = 0
         self.won_shares = 0
         self.save()
@@ -373,6 +409,9 @@ class Membership(BaseModel):
             self.save()
 
     def calculate_remaining_share(self):
+        if hasattr(self, "due_amount"):
+            # already annotated through ledger.annotate_paid_amount()
+            return self.due_amount - self.paid_amount
         return self.share_amount - self.balance
 
     def calculate_remaining_commission(self):
@@ -576,9 +615,21 @@ class Membership(BaseModel):
         self.save()
         super(Membership, self).delete(using, force)
 
+    @classmethod
+    def bulk_create_with_web_keys(cls, memberships, batch_size=None):
+        """
+        creates the MEMBERSHIPs with one INSERT per batch
+        bulk_create skips the pre_save signal, so the web keys are assigned in memory here
+        :param memberships: a list of unsaved MEMBERSHIP objects
+        :param batch_size: the number of rows of each INSERT
+        :return: the list of MEMBERSHIPs
+        """
+        for membership in memberships:
+            assign_web_key(cls, membership)
+        return cls.objects.bulk_create(memberships, batch_size=batch_size)
+
 
-@receiver(post_save, sender=Membership)
+@receiver(pre_save, sender=Membership)
 def assign_web_key(sender, instance, **kwargs):
     if instance.web_key is None or instance.web_key == "":
         instance.web_key = generate_alphanumeric_uid(settings.MEMBERSHIP_WEB_KEY_LENGTH)
-        instance.save()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import models, transaction as db_transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch.dispatcher import receiver
+from django.utils.translation import ugettext_lazy as _
+
+from payment.models import Transaction
+from utils.constants import choice
+from utils.models import BaseModel
+
+
+def get_local_score_parameters():
+    """
+    the (attenuator, alpha, days_factor) of the local scores, the same ones the legacy
+    utils.scoring calculation uses
+    """
+    from utils import scoring
+
+    return scoring.ATTENUATOR, scoring.ALPHA, scoring.DAYS_FACTOR
+
+
+def get_running_score_parameters():
+    """
+    the local score parameters if the running scores are turned on (RUNNING_SCORES_ENABLED),
+    None otherwise, in which case the scores are only maintained by the periodic full recalculation
+    """
+    if not getattr(settings, "RUNNING_SCORES_ENABLED", False):
+        return None
+    return get_local_score_parameters()
+
+
+class BaseRunningScore(BaseModel):
+    """
+    the incrementally maintained score of an owner (a MEMBERSHIP or a POOLSHIP)
+    each successful transaction rescales the score to its time and adds its contribution,
+    reads rescale the score to the requested time lazily
+
+    FIELDS
+    score: the score as of score_time
+    score_time: the time which the score is valid at
+    """
+    # the name of the one to one field of the owner, set by the concrete models
+    owner_field = None
+
+    score = models.FloatField(_("Score"), default=0.0)
+    score_time = models.DateTimeField(_("Score Time"), null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def score_at(self, moment, alpha, days_factor):
+        """
+        the score rescaled from score_time to the moment
+        """
+        if self.score_time is None:
+            return self.score
+        delta_days = (moment - self.score_time).total_seconds() / 86400
+        return self.score * (1 + alpha) ** (delta_days / days_factor)
+
+    @classmethod
+    def calculate_seed_scores(cls, owners, origin_date, attenuator, alpha, days_factor):
+        """
+        the full calculation of the scores of the owners out of their history
+        :return: a dict of the owner id to its score
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def accrue(cls, owner, amount, moment, attenuator, alpha, days_factor):
+        """
+        rescales the score of the owner to the moment and adds the (signed) amount to it
+        a missing score is seeded by the full calculation of the history (which already includes
+        the amount) instead of starting from zero
+        """
+        lookup = {cls.owner_field: owner}
+        with db_transaction.atomic():
+            running_score = cls.objects.select_for_update().filter(**lookup).first()
+            if running_score is None:
+                seed_score = cls.calculate_seed_scores(
+                    owner.__class__.objects.filter(pk=owner.pk),
+                    moment.replace(tzinfo=None),
+                    attenuator,
+                    alpha,
+                    days_factor,
+                )[owner.pk]
+                running_score, created = cls.objects.get_or_create(
+                    defaults={"score": seed_score, "score_time": moment}, **lookup
+                )
+                if created:
+                    return running_score
+                running_score = cls.objects.select_for_update().get(pk=running_score.pk)
+
+            running_score.score = (
+                running_score.score_at(moment, alpha, days_factor) + amount / attenuator
+            )
+            running_score.score_time = moment
+            running_score.save()
+        return running_score
+
+
+class RunningScore(BaseRunningScore):
+    """
+    the running score of a MEMBERSHIP, out of its cycle transactions
+
+    FIELDS
+    membership: the MEMBERSHIP which the score is belonged
+    """
+    owner_field = "membership"
+
+    membership = models.OneToOneField(
+        "cashbox_management.Membership",
+        on_delete=models.CASCADE,
+        related_name="running_score",
+    )
+
+    class Meta:
+        verbose_name = _("running score")
+        verbose_name_plural = _("running scores")
+
+    def __str__(self):
+        return "(%s)>>%s" % (str(self.score), self.membership.__str__())
+
+    @classmethod
+    def calculate_seed_scores(cls, owners, origin_date, attenuator, alpha, days_factor):
+        from cashbox_management.scoring import calculate_memberships_local_scores
+
+        return calculate_memberships_local_scores(
+            owners, origin_date, attenuator, alpha, days_factor
+        )
+
+
+class PoolshipRunningScore(BaseRunningScore):
+    """
+    the running score of a POOLSHIP, out of its moneypool transactions
+
+    FIELDS
+    poolship: the POOLSHIP which the score is belonged
+    """
+    owner_field = "poolship"
+
+    poolship = models.OneToOneField(
+        "moneypool_management.Poolship",
+        on_delete=models.CASCADE,
+        related_name="running_score",
+    )
+
+    class Meta:
+        verbose_name = _("poolship running score")
+        verbose_name_plural = _("poolship running scores")
+
+    def __str__(self):
+        return "(%s)>>%s" % (str(self.score), self.poolship.__str__())
+
+    @classmethod
+    def calculate_seed_scores(cls, owners, origin_date, attenuator, alpha, days_factor):
+        from cashbox_management.scoring import calculate_poolships_local_scores
+
+        return calculate_poolships_local_scores(
+            owners, origin_date, attenuator, alpha, days_factor
+        )
+
+
+def get_score_owner(instance):
+    """
+    the running score model and the MEMBERSHIP or POOLSHIP whose score the TRANSACTION
+    contributes to, if any
+    :return: a (model, owner) pair or None
+    """
+    if instance.ctx_type == choice.TRANSACTION_CTX_TYPE_CYCLE:
+        from cashbox_management.models.membership import Membership
+
+        owner = Membership.objects.filter(
+            period__cycles__id=instance.ctx_id, member_id=instance.receiver_id
+        ).first()
+        return (RunningScore, owner) if owner is not None else None
+    if instance.ctx_type == choice.TRANSACTION_CTX_TYPE_MONEYPOOL:
+        from moneypool_management.models import Poolship
+
+        owner = Poolship.objects.filter(
+            moneypool_id=instance.ctx_id, member_id=instance.receiver_id
+        ).first()
+        return (PoolshipRunningScore, owner) if owner is not None else None
+    return None
+
+
+@receiver(pre_save, sender=Transaction)
+def mark_successful_transition(sender, instance, **kwargs):
+    # a transaction is accounted only once, when it becomes successful
+    instance._becomes_successful = (
+        instance.state == choice.TRANSACTION_STATE_SUCCESSFUL
+        and get_running_score_parameters() is not None
+        and (
+            instance.pk is None
+            or not Transaction.objects.filter(
+                pk=instance.pk, state=choice.TRANSACTION_STATE_SUCCESSFUL
+            ).exists()
+        )
+    )
+
+
+@receiver(post_save, sender=Transaction)
+def accrue_running_score(sender, instance, **kwargs):
+    if (
+            not instance.__dict__.pop("_becomes_successful", False)
+            or instance.is_group_pay
+            or instance.receiver_id is None
+            or instance.state_time is None
+    ):
+        return
+    if instance.source in (choice.TRANSACTION_SRC_GATEWAY, choice.TRANSACTION_SRC_HAMYAN_WALLET):
+        amount = instance.amount
+    elif instance.destination == choice.TRANSACTION_DST_MEMBER_BANKACCOUNT:
+        amount = -instance.amount
+    else:
+        return
+
+    score_owner = get_score_owner(instance)
+    if score_owner is None:
+        return
+
+    model, owner = score_owner
+    attenuator, alpha, days_factor = get_running_score_parameters()
+    model.accrue(owner, amount, instance.state_time, attenuator, alpha, days_factor)
@@ -0,0 +1,237 @@
+from django.db.models import Case, FloatField, Q, Value, When
+from django.utils import timezone
+
+from cashbox_management.models import Cycle
+from cashbox_management.models.membership import Membership
+from cashbox_management.models.running_score import (
+    PoolshipRunningScore,
+    RunningScore,
+    get_local_score_parameters,
+    get_running_score_parameters,
+)
+from payment.models.transaction import Transaction
+from utils.constants import choice
+from utils.mixins import date_to_datetime
+
+SCORING_CHUNK_SIZE = 5000
+SCORE_UPDATE_BATCH_SIZE = 500
+
+
+def decayed_amount(amount, delta_days, attenuator, alpha, days_factor):
+    """
+    the contribution of an amount which is paid (or cashed out) delta_days before the origin date
+    """
+    return amount / attenuator * (1 + alpha) ** (delta_days / days_factor)
+
+
+def elapsed_days(origin_date, moment):
+    """
+    the whole days from the moment to the (naive) origin date, as the legacy scores count them
+    """
+    return (origin_date - date_to_datetime(moment).replace(tzinfo=None)).days
+
+
+def accumulate_local_scores(scores, owner_ids, transactions, origin_date, attenuator, alpha,
+                            days_factor):
+    """
+    adds the decayed contributions of the TRANSACTIONs to the scores of their owners in one pass,
+    the transactions are streamed in chunks of id order instead of one query per owner
+    :param scores: a dict of the owner id to its score, updated in place
+    :param owner_ids: a function of (ctx_id, receiver_id) to the owner id or None
+    """
+    last_transaction_id = 0
+    while True:
+        chunk = list(
+            transactions.filter(id__gt=last_transaction_id)
+            .order_by("id")
+            .values_list(
+                "id", "ctx_id", "receiver_id", "amount", "state_time", "source"
+            )[:SCORING_CHUNK_SIZE]
+        )
+        if len(chunk) == 0:
+            break
+        last_transaction_id = chunk[-1][0]
+
+        for _, ctx_id, receiver_id, amount, state_time, source in chunk:
+            owner_id = owner_ids(ctx_id, receiver_id)
+            if owner_id is None:
+                continue
+            delta_days = elapsed_days(origin_date, state_time)
+            score = decayed_amount(amount, delta_days, attenuator, alpha, days_factor)
+            if source in (
+                    choice.TRANSACTION_SRC_GATEWAY,
+                    choice.TRANSACTION_SRC_HAMYAN_WALLET,
+            ):
+                scores[owner_id] += score
+            else:
+                scores[owner_id] -= score
+    return scores
+
+
+def scored_transactions(ctx_type, ctx_ids, origin_date):
+    """
+    the successful payments and cashouts of the contexts up to the origin date
+    """
+    return Transaction.objects.filter(
+        Q(source__in=(choice.TRANSACTION_SRC_GATEWAY, choice.TRANSACTION_SRC_HAMYAN_WALLET))
+        | Q(destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT),
+        ctx_type=ctx_type,
+        ctx_id__in=ctx_ids,
+        state=choice.TRANSACTION_STATE_SUCCESSFUL,
+        state_time__lte=date_to_datetime(origin_date),
+    )
+
+
+def calculate_memberships_local_scores(
+        memberships, origin_date, attenuator, alpha, days_factor
+):
+    """
+    calculates the local scores of the MEMBERSHIPs in one pass over their cycle TRANSACTIONs
+    the transactions are streamed in chunks of id order instead of one query per membership
+    :param memberships: a queryset of MEMBERSHIPs
+    :return: a dict of the membership id to its local score
+    """
+    membership_ids = dict()
+    for membership_id, period_id, member_id in memberships.values_list(
+            "id", "period_id", "member_id"
+    ):
+        membership_ids[(period_id, member_id)] = membership_id
+    scores = dict.fromkeys(membership_ids.values(), 0)
+    if len(scores) == 0:
+        return scores
+
+    cycles = Cycle.objects.filter(period__in=memberships.values("period_id"))
+    cycle_periods = dict(cycles.values_list("id", "period_id"))
+
+    return accumulate_local_scores(
+        scores,
+        lambda cycle_id, receiver_id: membership_ids.get((cycle_periods.get(cycle_id), receiver_id)),
+        scored_transactions(choice.TRANSACTION_CTX_TYPE_CYCLE, cycles.values("id"), origin_date),
+        origin_date,
+        attenuator,
+        alpha,
+        days_factor,
+    )
+
+
+def calculate_poolships_local_scores(
+        poolships, origin_date, attenuator, alpha, days_factor
+):
+    """
+    calculates the local scores of the POOLSHIPs in one pass over their moneypool TRANSACTIONs
+    :param poolships: a queryset of POOLSHIPs
+    :return: a dict of the poolship id to its local score
+    """
+    poolship_ids = dict()
+    for poolship_id, moneypool_id, member_id in poolships.values_list(
+            "id", "moneypool_id", "member_id"
+    ):
+        poolship_ids[(moneypool_id, member_id)] = poolship_id
+    scores = dict.fromkeys(poolship_ids.values(), 0)
+    if len(scores) == 0:
+        return scores
+
+    return accumulate_local_scores(
+        scores,
+        lambda moneypool_id, receiver_id: poolship_ids.get((moneypool_id, receiver_id)),
+        scored_transactions(
+            choice.TRANSACTION_CTX_TYPE_MONEYPOOL, poolships.values("moneypool_id"), origin_date
+        ),
+        origin_date,
+        attenuator,
+        alpha,
+        days_factor,
+    )
+
+
+def update_local_scores(model, scores):
+    """
+    writes the local scores back with one UPDATE ... CASE per batch of owners
+    :param model: the model of the owners (MEMBERSHIP or POOLSHIP)
+    :param scores: a dict of the owner id to its local score
+    """
+    owner_ids = sorted(scores)
+    for start in range(0, len(owner_ids), SCORE_UPDATE_BATCH_SIZE):
+        batch = owner_ids[start:start + SCORE_UPDATE_BATCH_SIZE]
+        model.objects.filter(id__in=batch).update(
+            local_score=Case(
+                *[
+                    When(id=owner_id, then=Value(scores[owner_id]))
+                    for owner_id in batch
+                ],
+                output_field=FloatField()
+            )
+        )
+
+
+def recalculate_memberships_local_scores():
+    """
+    the periodic full recalculation of the local scores of all MEMBERSHIPs in one streamed pass
+    """
+    attenuator, alpha, days_factor = get_local_score_parameters()
+    update_local_scores(
+        Membership,
+        calculate_memberships_local_scores(
+            Membership.objects.all(),
+            timezone.now().replace(tzinfo=None),
+            attenuator,
+            alpha,
+            days_factor,
+        )
+    )
+
+
+def reconcile_running_scores(running_score_model, owners):
+    """
+    the periodic reconciliation of the running scores of the owners
+    the owners without a running score are seeded by a full calculation, then the local scores
+    of all owners are rescaled to now and written back
+    :param running_score_model: RunningScore or PoolshipRunningScore
+    :param owners: the queryset of all the owners of the model
+    :return: False if the running scores are not configured, True otherwise
+    """
+    parameters = get_running_score_parameters()
+    if parameters is None:
+        return False
+    attenuator, alpha, days_factor = parameters
+    now = timezone.now()
+    owner_id_field = running_score_model.owner_field + "_id"
+
+    seed_scores = running_score_model.calculate_seed_scores(
+        owners.filter(running_score__isnull=True),
+        now.replace(tzinfo=None),
+        attenuator,
+        alpha,
+        days_factor,
+    )
+    running_score_model.objects.bulk_create(
+        [
+            running_score_model(score=score, score_time=now, **{owner_id_field: owner_id})
+            for owner_id, score in seed_scores.items()
+        ],
+        batch_size=SCORE_UPDATE_BATCH_SIZE,
+    )
+
+    scores = dict()
+    for running_score in running_score_model.objects.iterator():
+        scores[getattr(running_score, owner_id_field)] = running_score.score_at(
+            now, alpha, days_factor
+        )
+    update_local_scores(owners.model, scores)
+    return True
+
+
+def reconcile_memberships_running_scores():
+    """
+    reconciles the running scores of the MEMBERSHIPs into their local scores
+    """
+    return reconcile_running_scores(RunningScore, Membership.objects.all())
+
+
+def reconcile_poolships_running_scores():
+    """
+    reconciles the running scores of the POOLSHIPs into their local scores
+    """
+    from moneypool_management.models import Poolship
+
+    return reconcile_running_scores(PoolshipRunningScore, Poolship.objects.all())
@@ -0,0 +1,128 @@
+from celery import shared_task
+
+from account_management.models import Member
+from cashbox_management.draw_pipeline import DrawResult
+from cashbox_management.models import Cashbox, Membership
+from cashbox_management.models.winner import Winner
+from utils.constants import choice
+from utils.constants.notification_constant import NOTIFICATION_ACTION_FIELD_MAIN
+from utils.firebase import notification_templates as notif
+from utils.firebase.notification import (
+    send_notification_to_member_list,
+    create_page_notification_data,
+)
+from utils.message import message_templates as msg
+from utils.message.message import send_message_to_member_list
+from utils.mixins import spacey
+from utils.sms import sms_templates
+from utils.tasks import send_high_priority_templated_sms
+
+DRAW_ANNOUNCEMENT_BATCH_SIZE = 200
+
+
+@shared_task(queue=choice.CELERY_DEFAULT_QUEUE)
+def announce_draw_result(draw_result):
+    """
+    fans out the message, notification and sms announcements of a draw in batches of members
+    :param draw_result: the dict of a DrawResult
+    """
+    result = DrawResult.from_dict(draw_result)
+    cashbox = Cashbox.objects.filter(id=result.cashbox_id).first()
+    if cashbox is None or cashbox.is_archived:
+        return
+
+    if result.winners_name is None:
+        message_body = msg.CYCLE_WINNER_ANNOUNCEMENT_MSG.format(
+            result.winning_cycle_index, result.cashbox_name, result.draw_text
+        )
+        notification_body = notif.CYCLE_WINNER_ANNOUNCEMENT_BODY.format(
+            result.winning_cycle_index, result.cashbox_name, result.draw_text
+        )
+        sms_template = sms_templates.DRAW_RESULT
+        sms_args = (
+            result.winning_cycle_index,
+            spacey(result.cashbox_name),
+            spacey(result.draw_text),
+        )
+    else:
+        message_body = msg.CYCLE_WINNER_NAMED_ANNOUNCEMENT_MSG.format(
+            result.winning_cycle_index,
+            result.cashbox_name,
+            result.draw_text,
+            result.winners_name,
+        )
+        notification_body = notif.CYCLE_WINNER_NAMED_ANNOUNCEMENT_BODY.format(
+            result.winning_cycle_index,
+            result.cashbox_name,
+            result.draw_text,
+            result.winners_name,
+        )
+        sms_template = sms_templates.DRAW_NAMED_RESULT
+        sms_args = (
+            result.winning_cycle_index,
+            spacey(result.cashbox_name),
+            spacey(result.draw_text),
+            spacey(result.winners_name),
+        )
+
+    send_notifications = (
+        cashbox.notification_announce != choice.ANNOUNCEMENT_MODE_SILENT
+    )
+    send_smses = not cashbox.is_test and cashbox.has_perm(
+        choice.FEATURE_SMS_ANNOUNCEMENT
+    )
+
+    member_ids = result.recipient_member_ids
+    for start in range(0, len(member_ids), DRAW_ANNOUNCEMENT_BATCH_SIZE):
+        members = list(
+            Member.objects.filter(
+                id__in=member_ids[start:start + DRAW_ANNOUNCEMENT_BATCH_SIZE]
+            )
+        )
+        send_message_to_member_list(
+            member_list=members,
+            action=choice.MESSAGE_ACTION_CASHBOX,
+            params=cashbox.id,
+            body=message_body,
+        )
+        if send_notifications:
+            send_notification_to_member_list(
+                notif.CYCLE_WINNER_ANNOUNCEMENT_TITLE,
+                notification_body,
+                members,
+                notif_data=create_page_notification_data(
+                    page=NOTIFICATION_ACTION_FIELD_MAIN
+                ),
+            )
+        if send_smses:
+            for member in members:
+                send_high_priority_templated_sms.delay(
+                    phone_number=member.phone_number,
+                    template=sms_template,
+                    args=sms_args,
+                )
+
+    winners = list(Winner.objects.filter(cycle_id=result.cycle_id))
+    if len(winners) == 0:
+        return
+    cashbox.send_winner_self_announcement_message(winners, result.draw_type)
+    cashbox.send_winner_self_announcement_notification(winners, result.draw_type)
+    cashbox.send_winner_self_announcement_sms(winners, result.draw_type)
+
+
+@shared_task(queue=choice.CELERY_DEFAULT_QUEUE)
+def send_bulk_invitations(membership_ids, created_member_ids):
+    """
+    sends the invitation message, notification and sms of the bulk invited MEMBERSHIPs
+    :param membership_ids: the ids of the invited MEMBERSHIPs
+    :param created_member_ids: the ids of the MEMBERs which are created by the invitation
+    """
+    created_member_ids = set(created_member_ids)
+    memberships = Membership.objects.filter(id__in=membership_ids).select_related(
+        "member", "period__cashbox"
+    )
+    for membership in memberships:
+        is_created = membership.member_id in created_member_ids
+        membership.send_invitation_message()
+        membership.send_invitation_notification(is_created)
+        membership.send_invitation_sms(is_created)
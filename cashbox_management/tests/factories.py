@@ -0,0 +1,37 @@
+from django.utils import timezone
+
+from account_management.models import Member
+from cashbox_management.models import Cashbox, Cycle, Membership, Period
+from payment.models import Transaction
+from utils.constants import choice
+
+
+def create_period(share_value=100000, cycles_count=2):
+    cashbox = Cashbox.objects.create(name="test cashbox")
+    period = Period.objects.create(cashbox=cashbox, index=1, share_value=share_value)
+    for index in range(1, cycles_count + 1):
+        Cycle.objects.create(period=period, index=index)
+    return period
+
+
+def create_membership(period, phone_number, number_of_shares=1, **kwargs):
+    member = Member.objects.create(phone_number=phone_number)
+    return Membership.objects.create(
+        period=period, member=member, number_of_shares=number_of_shares, **kwargs
+    )
+
+
+def create_cycle_payment(cycle, member, amount, state=choice.TRANSACTION_STATE_SUCCESSFUL,
+                         state_time=None, **kwargs):
+    return Transaction.objects.create(
+        payer=member,
+        receiver=member,
+        ctx_id=cycle.id,
+        ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+        amount=amount,
+        source=kwargs.pop("source", choice.TRANSACTION_SRC_GATEWAY),
+        destination=kwargs.pop("destination", choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE),
+        state=state,
+        state_time=state_time or timezone.now(),
+        **kwargs
+    )
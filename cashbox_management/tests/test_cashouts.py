@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from cashbox_management.models import Cashbox
+from cashbox_management.tests.factories import create_membership, create_period
+from payment.models import Transaction
+from utils.constants import choice
+
+
+class CreateCashoutsTest(TestCase):
+    def setUp(self):
+        self.period = create_period()
+        self.cashbox = self.period.cashbox
+        create_membership(self.period, "09120000001", role=choice.CASHBOX_ROLE_OWNER)
+        self.members = [
+            create_membership(self.period, phone_number).member
+            for phone_number in ("09120000002", "09120000003", "09120000004")
+        ]
+
+    def test_cashouts_are_created_and_returned_in_order(self):
+        member_amounts = [(member, 1000 * (index + 1)) for index, member in enumerate(self.members)]
+        with mock.patch.object(
+                Cashbox, "balance", new_callable=mock.PropertyMock, return_value=10000
+        ):
+            cashouts = self.cashbox.create_cashouts(member_amounts)
+
+        self.assertEqual(
+            [(cashout.receiver_id, cashout.amount) for cashout in cashouts],
+            [(member.id, amount) for member, amount in member_amounts],
+        )
+        rows = Transaction.objects.filter(
+            destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT,
+            ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+            ctx_id=self.cashbox.get_current_cycle().id,
+        ).order_by("id")
+        self.assertEqual(
+            list(rows.values_list("id", "receiver_id", "amount", "payer_id")),
+            [
+                (cashout.id, member.id, amount, self.cashbox.get_owner().id)
+                for cashout, (member, amount) in zip(cashouts, member_amounts)
+            ],
+        )
+
+    def test_cashouts_over_the_balance_are_not_created(self):
+        with mock.patch.object(
+                Cashbox, "balance", new_callable=mock.PropertyMock, return_value=1000
+        ):
+            self.assertIsNone(
+                self.cashbox.create_cashouts([(member, 1000) for member in self.members])
+            )
+        self.assertFalse(
+            Transaction.objects.filter(
+                destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT
+            ).exists()
+        )
@@ -0,0 +1,80 @@
+import bisect
+import itertools
+import random
+
+from django.test import SimpleTestCase
+
+from cashbox_management.draw_engine import FenwickTree, WeightedDraw, drawable_candidates
+from cashbox_management.models import Cycle, Membership
+
+CANDIDATES = [("a", 3), ("b", 0), ("c", 1), ("d", 5), ("e", 2), ("f", 1)]
+
+
+def bisect_draw(candidates, seed, winners_count):
+    """
+    the reference draw which rebuilds the cumulative weights on every pick
+    """
+    rng = random.Random(seed)
+    remaining = [(candidate, weight) for candidate, weight in candidates if weight > 0]
+    winners = []
+    while remaining and len(winners) < winners_count:
+        cumulative_weights = list(itertools.accumulate(weight for _, weight in remaining))
+        index = bisect.bisect_right(cumulative_weights, rng.random() * cumulative_weights[-1])
+        winners.append(remaining.pop(index)[0])
+    return winners
+
+
+class FenwickTreeTest(SimpleTestCase):
+    def test_find_skips_the_removed_weights(self):
+        weights = FenwickTree([3, 1, 5])
+        self.assertEqual(weights.find(0), 0)
+        self.assertEqual(weights.find(3.5), 1)
+        self.assertEqual(weights.find(8.9), 2)
+
+        weights.add(1, -1)
+        self.assertEqual(weights.find(3.5), 2)
+
+
+class WeightedDrawTest(SimpleTestCase):
+    def test_same_seed_replays_the_same_winners(self):
+        for seed in range(50):
+            self.assertEqual(
+                WeightedDraw(CANDIDATES, seed=seed).draw(4),
+                WeightedDraw(CANDIDATES, seed=seed).draw(4),
+            )
+
+    def test_winners_match_the_cumulative_bisect_draw(self):
+        for seed in range(200):
+            self.assertEqual(
+                WeightedDraw(CANDIDATES, seed=seed).draw(len(CANDIDATES)),
+                bisect_draw(CANDIDATES, seed, len(CANDIDATES)),
+            )
+
+    def test_winners_are_distinct_and_weighted(self):
+        winners = WeightedDraw(CANDIDATES, seed=7).draw(len(CANDIDATES))
+        self.assertEqual(sorted(winners), ["a", "c", "d", "e", "f"])
+
+    def test_replay_uses_the_persisted_weights(self):
+        weighted_draw = WeightedDraw([(11, 2), (12, 1), (13, 4)], seed=42)
+        cycle = Cycle(
+            draw_seed=weighted_draw.seed,
+            draw_weights="[[11, 2], [12, 1], [13, 4]]",
+        )
+        self.assertEqual(cycle.replay_draw(), weighted_draw.draw())
+        self.assertIsNone(Cycle().replay_draw())
+
+    def test_replay_of_a_multi_winner_draw(self):
+        first, second, third = Membership(id=1), Membership(id=2), Membership(id=3)
+        weighted_draw = WeightedDraw(
+            drawable_candidates([third, first, third, second, third, first]), seed=42
+        )
+        self.assertEqual(weighted_draw.candidates, [(first, 2), (second, 1), (third, 3)])
+
+        cycle = Cycle(
+            draw_seed=weighted_draw.seed,
+            draw_weights='[[["membership", 1], 2], [["membership", 2], 1], [["membership", 3], 3]]',
+        )
+        self.assertEqual(
+            cycle.replay_draw(2),
+            [["membership", drawable.pk] for drawable in weighted_draw.draw(2)],
+        )
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from cashbox_management.draw_pipeline import DrawPipeline
+from cashbox_management.models import Cashbox, Cycle, Period
+from cashbox_management.models.winner import Winner
+from cashbox_management.tests.factories import create_membership, create_period
+from utils.constants import choice
+
+
+class DrawPipelineTest(TestCase):
+    def setUp(self):
+        self.period = create_period()
+        self.cashbox = self.period.cashbox
+        self.cashbox.state = choice.CASHBOX_STATE_ACTIVATED
+        self.cashbox.save()
+        create_membership(self.period, "09120000001", role=choice.CASHBOX_ROLE_OWNER)
+        create_membership(self.period, "09120000002")
+
+    def test_failed_draw_writes_nothing(self):
+        cycle_index = self.period.cycle_index
+        with mock.patch.object(Cashbox, "is_financially_satisfied", return_value=False), \
+                mock.patch("cashbox_management.tasks.announce_draw_result") as announce:
+            self.assertIsNone(DrawPipeline(self.cashbox).run())
+
+        self.assertEqual(Cycle.objects.filter(period=self.period).count(), 2)
+        self.assertEqual(Period.objects.get(pk=self.period.pk).cycle_index, cycle_index)
+        self.assertEqual(
+            Cashbox.objects.get(pk=self.cashbox.pk).state, choice.CASHBOX_STATE_ACTIVATED
+        )
+        cycle = Cycle.objects.get(period=self.period, index=cycle_index)
+        self.assertIsNone(cycle.winner)
+        self.assertFalse(Winner.objects.filter(cycle=cycle).exists())
+        announce.delay.assert_not_called()
+
+    def test_failed_draw_does_not_start_a_new_cycle(self):
+        with mock.patch.object(Cashbox, "is_financially_satisfied", return_value=False):
+            self.assertIsNone(self.cashbox.draw_cycle_and_start_new())
+
+        self.assertEqual(Cycle.objects.filter(period=self.period).count(), 2)
+        self.assertEqual(Period.objects.get(pk=self.period.pk).cycle_index, self.period.cycle_index)
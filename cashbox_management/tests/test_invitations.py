@@ -0,0 +1,50 @@
+from django.db.models.signals import post_save
+from django.test import TestCase
+
+from account_management.models.member import Member
+from cashbox_management.invitations import invite_members
+from cashbox_management.tests.factories import create_membership, create_period
+
+
+class InviteMembersTest(TestCase):
+    def setUp(self):
+        self.period = create_period()
+        self.enrolled = create_membership(self.period, "09120000001")
+        self.existing_member = Member.objects.create(phone_number="09120000002")
+
+    def test_only_the_new_members_are_invited_and_created(self):
+        created_members = []
+
+        def record_created_member(sender, instance, created, **kwargs):
+            if created:
+                created_members.append(instance.phone_number)
+
+        post_save.connect(record_created_member, sender=Member)
+        try:
+            memberships, created_member_ids = invite_members(
+                self.period,
+                [
+                    {"phone_number": "09120000001"},
+                    {"phone_number": "09120000002", "number_of_shares": 2},
+                    {"phone_number": "09120000003"},
+                ],
+            )
+        finally:
+            post_save.disconnect(record_created_member, sender=Member)
+
+        self.assertEqual(
+            sorted((membership.member.phone_number, membership.number_of_shares)
+                   for membership in memberships),
+            [("09120000002", 2), ("09120000003", 1)],
+        )
+        self.assertEqual(
+            created_member_ids,
+            set(Member.objects.filter(phone_number="09120000003").values_list("id", flat=True)),
+        )
+        # the bulk created members go through the same post_save as the single invitation
+        self.assertEqual(created_members, ["09120000003"])
+        self.assertTrue(all(membership.web_key for membership in memberships))
+
+    def test_nothing_is_invited_without_a_period(self):
+        self.assertEqual(invite_members(None, [{"phone_number": "09120000004"}]), ([], set()))
+        self.assertFalse(Member.objects.filter(phone_number="09120000004").exists())
@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from cashbox_management.models import Membership, Period
+from cashbox_management.models.ledger import (
+    LedgerEntry,
+    annotate_paid_amount,
+    get_unpaid_memberships,
+    open_legacy_balances,
+    replay_cycle_payments,
+)
+from cashbox_management.tests.factories import (
+    create_cycle_payment,
+    create_membership,
+    create_period,
+)
+from utils.constants import choice
+
+
+@override_settings(LEDGER_BALANCES_ENABLED=True)
+class LedgerTest(TestCase):
+    def setUp(self):
+        self.period = create_period(share_value=100000)
+        self.cycle = self.period.cycles.get(index=1)
+        self.membership = create_membership(self.period, "09120000001")
+
+    def test_paid_amount_is_the_sum_of_the_successful_payments(self):
+        create_cycle_payment(self.cycle, self.membership.member, 30000)
+        create_cycle_payment(self.cycle, self.membership.member, 20000)
+        create_cycle_payment(
+            self.cycle, self.membership.member, 50000, state=choice.TRANSACTION_STATE_FAILED
+        )
+
+        self.assertEqual(self.membership.balance, 50000)
+        self.assertEqual(
+            list(get_unpaid_memberships(self.period).values_list("id", flat=True)),
+            [self.membership.id],
+        )
+
+    def test_resaving_a_payment_does_not_credit_twice(self):
+        transaction = create_cycle_payment(self.cycle, self.membership.member, 100000)
+        transaction.save()
+
+        self.assertEqual(LedgerEntry.objects.filter(membership=self.membership).count(), 1)
+        self.assertEqual(self.membership.balance, 100000)
+        self.assertFalse(get_unpaid_memberships(self.period).exists())
+
+    def test_checkout_closes_the_open_entries(self):
+        create_cycle_payment(self.cycle, self.membership.member, 100000)
+        LedgerEntry.checkout(period=self.period)
+
+        self.assertEqual(self.membership.balance, 0)
+
+    def test_replay_appends_the_historical_payments_once(self):
+        create_cycle_payment(self.cycle, self.membership.member, 30000)
+        create_cycle_payment(self.cycle, self.membership.member, 70000)
+        LedgerEntry.objects.all().delete()
+
+        self.assertEqual(replay_cycle_payments(chunk_size=1), 2)
+        self.assertEqual(replay_cycle_payments(chunk_size=1), 0)
+        self.assertEqual(
+            sum(LedgerEntry.objects.filter(is_checked_out=True).values_list("amount", flat=True)),
+            100000,
+        )
+
+    def test_opening_balances_match_the_legacy_balances(self):
+        create_cycle_payment(self.cycle, self.membership.member, 30000)
+        self.membership.percentage_balance = 0.25
+        self.membership.save()
+        with mock.patch.object(
+                Period, "balance", new_callable=mock.PropertyMock, return_value=200000
+        ):
+            legacy_balance = self.membership.legacy_balance
+            self.assertEqual(legacy_balance, 50000)
+
+            self.assertEqual(open_legacy_balances(), 1)
+            self.assertEqual(open_legacy_balances(), 0)
+
+        self.assertEqual(
+            LedgerEntry.objects.get(membership=self.membership, transaction__isnull=True).amount,
+            20000,
+        )
+        self.assertEqual(self.membership.balance, legacy_balance)
+
+
+@override_settings(LEDGER_BALANCES_ENABLED=False)
+class LegacyPaidAmountTest(TestCase):
+    def setUp(self):
+        self.period = create_period(share_value=100000)
+        self.cycle = self.period.cycles.get(index=self.period.cycle_index)
+        self.memberships = [
+            create_membership(self.period, "09120000001"),
+            create_membership(self.period, "09120000002"),
+        ]
+
+    def test_unpaid_memberships_are_aggregated_from_the_current_cycle_payments(self):
+        create_cycle_payment(self.cycle, self.memberships[0].member, 60000)
+        create_cycle_payment(self.cycle, self.memberships[0].member, 40000)
+        create_cycle_payment(self.cycle, self.memberships[1].member, 50000)
+        create_cycle_payment(
+            self.cycle, self.memberships[1].member, 50000, state=choice.TRANSACTION_STATE_FAILED
+        )
+        # the payments of the other cycles are checked out already
+        other_cycle = self.period.cycles.exclude(pk=self.cycle.pk).first()
+        create_cycle_payment(other_cycle, self.memberships[1].member, 50000)
+
+        with self.assertNumQueries(1):
+            unpaid = list(get_unpaid_memberships(self.period))
+        self.assertEqual([membership.id for membership in unpaid], [self.memberships[1].id])
+        self.assertEqual(unpaid[0].remaining_share_amount, 50000)
+        self.assertFalse(unpaid[0].is_financially_satisfied)
+        self.assertFalse(self.period.cashbox.is_financially_satisfied())
+
+        create_cycle_payment(self.cycle, self.memberships[1].member, 50000)
+        self.assertFalse(get_unpaid_memberships(self.period).exists())
+        self.assertTrue(self.period.cashbox.is_financially_satisfied())
+
+    def test_annotated_memberships_answer_the_remaining_share_without_queries(self):
+        create_cycle_payment(self.cycle, self.memberships[0].member, 30000)
+        memberships = list(
+            annotate_paid_amount(Membership.objects.filter(period=self.period).order_by("id"))
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [membership.remaining_share_amount for membership in memberships], [70000, 100000]
+            )
@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from cashbox_management.models import Membership
+from cashbox_management.models.running_score import (
+    PoolshipRunningScore,
+    RunningScore,
+    get_local_score_parameters,
+)
+from cashbox_management.scoring import (
+    calculate_memberships_local_scores,
+    calculate_poolships_local_scores,
+    elapsed_days,
+    reconcile_poolships_running_scores,
+)
+from cashbox_management.tests.factories import (
+    create_cycle_payment,
+    create_membership,
+    create_period,
+)
+from moneypool_management.models import Poolship
+from moneypool_management.tests.factories import (
+    create_moneypool,
+    create_poolship,
+    mock_unpaid_portion,
+)
+from payment.models import Transaction
+from utils.constants import choice
+
+
+class ScoreAtTest(SimpleTestCase):
+    def test_partial_days_are_not_floored(self):
+        score_time = timezone.now()
+        running_score = RunningScore(score=100, score_time=score_time)
+        self.assertAlmostEqual(
+            running_score.score_at(score_time + timedelta(hours=36), -0.1, 30),
+            100 * 0.9 ** (1.5 / 30),
+        )
+
+    def test_local_scores_count_whole_days(self):
+        origin_date = timezone.now().replace(tzinfo=None)
+        self.assertEqual(elapsed_days(origin_date, origin_date - timedelta(hours=36)), 1)
+
+
+class RunningScoreTestMixin(object):
+    def assert_matches_the_full_calculation(self, running_score, full_score):
+        # the running score decays over the exact time, the legacy local score over whole days,
+        # so they may differ by at most one day of decay
+        _, alpha, days_factor = get_local_score_parameters()
+        self.assertLessEqual(
+            abs(running_score.score_at(self.now, alpha, days_factor) - full_score),
+            abs(full_score) * abs(1 - (1 + alpha) ** (1 / days_factor)) + 1e-9,
+        )
+
+
+class RunningScoreTest(RunningScoreTestMixin, TestCase):
+    def setUp(self):
+        period = create_period()
+        self.cycle = period.cycles.get(index=1)
+        self.membership = create_membership(period, "09120000001")
+        self.now = timezone.now()
+
+    def full_score(self):
+        return calculate_memberships_local_scores(
+            Membership.objects.filter(pk=self.membership.pk),
+            self.now.replace(tzinfo=None),
+            *get_local_score_parameters()
+        )[self.membership.pk]
+
+    def test_first_accrual_keeps_the_history(self):
+        # the payments before the running scores are turned on
+        create_cycle_payment(self.cycle, self.membership.member, 50000,
+                             state_time=self.now - timedelta(days=20, hours=6))
+        self.assertFalse(RunningScore.objects.exists())
+
+        with self.settings(RUNNING_SCORES_ENABLED=True):
+            create_cycle_payment(self.cycle, self.membership.member, 30000,
+                                 state_time=self.now - timedelta(days=2))
+        self.assert_matches_the_full_calculation(
+            RunningScore.objects.get(membership=self.membership), self.full_score()
+        )
+
+    @override_settings(RUNNING_SCORES_ENABLED=True)
+    def test_repeated_accruals_do_not_drift(self):
+        for hours in (100, 75, 50, 25, 1):
+            create_cycle_payment(self.cycle, self.membership.member, 10000,
+                                 state_time=self.now - timedelta(hours=hours))
+        self.assert_matches_the_full_calculation(
+            RunningScore.objects.get(membership=self.membership), self.full_score()
+        )
+
+
+@override_settings(RUNNING_SCORES_ENABLED=True)
+class PoolshipRunningScoreTest(RunningScoreTestMixin, TestCase):
+    def setUp(self):
+        mock_unpaid_portion(self)
+
+        self.moneypool = create_moneypool()
+        self.poolship = create_poolship(
+            self.moneypool, "09120000001", role=choice.MONEYPOOL_ROLE_OWNER
+        )
+        self.now = timezone.now()
+
+    def pay(self, amount, state_time):
+        return Transaction.objects.create(
+            payer=self.poolship.member,
+            receiver=self.poolship.member,
+            ctx_id=self.moneypool.id,
+            ctx_type=choice.TRANSACTION_CTX_TYPE_MONEYPOOL,
+            amount=amount,
+            source=choice.TRANSACTION_SRC_GATEWAY,
+            destination=choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE,
+            state=choice.TRANSACTION_STATE_SUCCESSFUL,
+            state_time=state_time,
+        )
+
+    def full_score(self):
+        return calculate_poolships_local_scores(
+            Poolship.objects.filter(pk=self.poolship.pk),
+            self.now.replace(tzinfo=None),
+            *get_local_score_parameters()
+        )[self.poolship.pk]
+
+    def test_moneypool_payments_accrue_the_poolship_score(self):
+        for hours in (60, 30, 2):
+            self.pay(20000, self.now - timedelta(hours=hours))
+
+        self.assertFalse(RunningScore.objects.exists())
+        self.assert_matches_the_full_calculation(
+            PoolshipRunningScore.objects.get(poolship=self.poolship), self.full_score()
+        )
+
+    def test_reconciliation_writes_the_poolship_local_scores(self):
+        self.pay(20000, self.now - timedelta(days=3))
+        PoolshipRunningScore.objects.all().delete()
+
+        self.assertTrue(reconcile_poolships_running_scores())
+        self.poolship.refresh_from_db()
+        self.assertAlmostEqual(self.poolship.local_score, self.full_score(), places=2)
+        self.assertTrue(PoolshipRunningScore.objects.filter(poolship=self.poolship).exists())
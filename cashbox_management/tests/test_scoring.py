@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from cashbox_management.models import Membership
+from cashbox_management.models.running_score import get_local_score_parameters
+from cashbox_management.scoring import (
+    calculate_memberships_local_scores,
+    recalculate_memberships_local_scores,
+)
+from cashbox_management.tests.factories import (
+    create_cycle_payment,
+    create_membership,
+    create_period,
+)
+from utils.constants import choice
+
+
+class LocalScoreTest(TestCase):
+    def setUp(self):
+        period = create_period()
+        cycle = period.cycles.get(index=1)
+        self.memberships = [
+            create_membership(period, "09120000001"),
+            create_membership(period, "09120000002"),
+        ]
+        now = timezone.now()
+        create_cycle_payment(cycle, self.memberships[0].member, 50000,
+                             state_time=now - timedelta(days=40))
+        create_cycle_payment(cycle, self.memberships[0].member, 30000,
+                             state_time=now - timedelta(days=3, hours=12))
+        create_cycle_payment(cycle, self.memberships[1].member, 20000,
+                             state_time=now - timedelta(days=10))
+        create_cycle_payment(
+            cycle, self.memberships[1].member, 10000,
+            state_time=now - timedelta(days=2),
+            source=choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
+            destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT,
+        )
+        self.origin_date = now.replace(tzinfo=None)
+
+    def test_batch_scores_match_the_per_membership_scores(self):
+        scores = calculate_memberships_local_scores(
+            Membership.objects.all(), self.origin_date, 1000, -0.1, 30
+        )
+        for membership in self.memberships:
+            self.assertAlmostEqual(
+                scores[membership.id],
+                membership.calculate_local_score(self.origin_date, 1000, -0.1, 30),
+            )
+
+    def test_recalculation_writes_the_scores_back(self):
+        recalculate_memberships_local_scores()
+        for membership in self.memberships:
+            membership.refresh_from_db()
+            self.assertAlmostEqual(
+                membership.local_score,
+                membership.calculate_local_score(
+                    self.origin_date, *get_local_score_parameters()
+                ),
+                places=2,
+            )
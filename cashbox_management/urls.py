@@ -7,6 +7,7 @@ from cashbox_management.views import (
     share_group_function_views,
     cycle_function_views,
     membership_function_views,
+    invitation_function_views,
 )
 
 draft_cashbox_urlpatterns = [
@@ -146,6 +147,11 @@ membership_urlpatterns = [
         membership_function_views.create_membership_list,
         name="invite-by-list",
     ),
+    url(
+        r"invite-bulk/$",
+        invitation_function_views.bulk_invite_memberships,
+        name="invite-bulk",
+    ),
     url(
         r"update/(?P<membership_id>\d+)/$",
         membership_function_views.update_membership,
@@ -0,0 +1,90 @@
+from django.db import transaction as db_transaction
+from django.http.response import JsonResponse
+from rest_framework import permissions
+from rest_framework.decorators import (
+    api_view,
+    permission_classes,
+    renderer_classes,
+    throttle_classes,
+)
+from rest_framework_swagger import renderers
+
+from cashbox_management.decorators import has_owner_role
+from cashbox_management.invitations import invite_members
+from cashbox_management.models.cashbox import Cashbox
+from cashbox_management.models.membership import Membership
+from cashbox_management.serializers.membership_serializer import (
+    OwnerMembershipSerializer,
+)
+from cashbox_management.tasks import send_bulk_invitations
+from cashbox_management.utils import is_phone_number_valid
+from utils import throttle
+
+
+@api_view(["POST"])
+@throttle_classes(
+    [throttle.UserMinuteRate, throttle.UserHourRate, throttle.UserDayRate]
+)
+@permission_classes((permissions.IsAuthenticated,))
+@renderer_classes(
+    [renderers.OpenAPIRenderer, renderers.SwaggerUIRenderer, renderers.JSONRenderer]
+)
+@has_owner_role
+def bulk_invite_memberships(request, id):
+    """
+    invites a list of phone numbers to the current period of the cashbox at once
+    :param request: body of the request contains the following params:
+    'members': a list of {'phone_number', 'number_of_shares' (default 1)}
+    :param id: the cashbox id
+    :return: a json response contains the newly invited memberships
+    """
+    data = request.data
+    if "members" not in data or not isinstance(data["members"], list):
+        return JsonResponse({"message": "no members in data"}, status=400)
+
+    cashbox = Cashbox.objects.get(id=id)
+    period = cashbox.get_current_period()
+    if period is None:
+        return JsonResponse({"message": "no period found"}, status=404)
+    if period.is_terminated:
+        return JsonResponse(
+            {"message": "current period is terminated, start new one and invite"},
+            status=403,
+        )
+
+    invitations = []
+    for member_data in data["members"]:
+        if "phone_number" not in member_data:
+            return JsonResponse(
+                {"message": "member data doesn't have phone_number"}, status=400
+            )
+        phone_number, phone_number_is_valid = is_phone_number_valid(
+            member_data["phone_number"]
+        )
+        if not phone_number_is_valid:
+            return JsonResponse(
+                {
+                    "message": "format of Phone number must be : +999999999. Up to 14 digits allowed."
+                },
+                status=401,
+            )
+        number_of_shares = member_data.get("number_of_shares", 1)
+        if not isinstance(number_of_shares, int) or number_of_shares < 1:
+            return JsonResponse({"message": "not a valid number_of_shares"}, status=400)
+        invitations.append(
+            {"phone_number": phone_number, "number_of_shares": number_of_shares}
+        )
+
+    memberships, created_member_ids = invite_members(period, invitations)
+    if len(memberships) > 0:
+        membership_ids = [membership.id for membership in memberships]
+        created_member_ids = sorted(created_member_ids)
+        db_transaction.on_commit(
+            lambda: send_bulk_invitations.delay(membership_ids, created_member_ids)
+        )
+
+    result = dict()
+    result["memberships"] = OwnerMembershipSerializer(
+        Membership.attach_cashouts(memberships), many=True
+    ).data
+    return JsonResponse(result, status=200)
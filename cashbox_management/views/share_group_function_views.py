@@ -23,7 +23,7 @@ from cashbox_management.serializers.membership_serializer import (
 )
 from cashbox_management.serializers.share_group_serializer import ShareGroupSerializer
 from cashbox_management.utils import is_phone_number_valid
-from payment.models import Transaction
+from payment.querysets import period_transactions
 from utils import throttle
 from utils.constants import choice
 from utils.log import info_logger
@@ -152,7 +152,6 @@ def kick_out_share_group(request, id, share_group_id):
     """
     cashbox = Cashbox.objects.get(id=id)
     period = cashbox.get_current_period()
-    cycles = period.cycles.all()
 
     if cashbox.state == choice.CASHBOX_STATE_ACTIVATED and period.cycle_index > 1:
         return JsonResponse(
@@ -175,13 +174,10 @@ def kick_out_share_group(request, id, share_group_id):
 
     for membership in to_be_kicked_share_groups[0].memberships.all():
         to_be_kicked_member = membership.member
-        to_be_kicked_member_transactions = Transaction.objects.filter(
-            (Q(payer=to_be_kicked_member) | Q(receiver=to_be_kicked_member))
-            & Q(ctx_id__in=[cycle.id for cycle in cycles])
-            & Q(ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE)
-            & Q(state=choice.TRANSACTION_STATE_SUCCESSFUL)
-        )
-        if to_be_kicked_member_transactions.count() > 0:
+        to_be_kicked_member_transactions = period_transactions(
+            period, state=choice.TRANSACTION_STATE_SUCCESSFUL
+        ).filter(Q(payer=to_be_kicked_member) | Q(receiver=to_be_kicked_member))
+        if to_be_kicked_member_transactions.exists():
             return JsonResponse(
                 {"message": "member has successful transaction(s)... can't be kicked!"},
                 status=400,
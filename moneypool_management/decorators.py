@@ -4,20 +4,45 @@ from moneypool_management.models import Moneypool, Poolship
 from utils.constants import choice
 
 
-def is_moneypool_member(view_function):
-    def _decorated(request, id, *args, **kwargs):
-        moneypool = Moneypool.objects.filter(id=id).first()
-        if not moneypool:
-            return JsonResponse({"message": "no moneypool found"}, status=404)
+def resolve_poolship(request, id):
+    """
+    the POOLSHIP of the requester in the MONEYPOOL with its moneypool and member in one query,
+    memoized on the request so the nested decorators and the views reuse the loaded objects
+    :return: the POOLSHIP or None if the requester is not a member of the moneypool
+    """
+    poolships = request.__dict__.setdefault("_moneypool_poolships", dict())
+    key = str(id)
+    if key not in poolships:
+        poolships[key] = (
+            Poolship.objects.select_related("moneypool", "member")
+            .filter(moneypool_id=id, member=request.user)
+            .first()
+        )
+    return poolships[key]
+
+
+def is_owner(poolship):
+    return poolship.role == choice.MONEYPOOL_ROLE_OWNER
+
+
+def is_owner_or_manager(poolship):
+    return poolship.role in (choice.MONEYPOOL_ROLE_OWNER, choice.MONEYPOOL_ROLE_MANAGER)
+
 
-        poolship = Poolship.objects.filter(
-            moneypool=moneypool, member=request.user
-        ).first()
+def _not_found_response(id):
+    # the moneypool is looked up only on the failure path to keep the messages
+    if not Moneypool.objects.filter(id=id).exists():
+        return JsonResponse({"message": "no moneypool found"}, status=404)
+    return JsonResponse({"message": "no poolship found"}, status=404)
 
+
+def is_moneypool_member(view_function):
+    def _decorated(request, id, *args, **kwargs):
+        poolship = resolve_poolship(request, id)
         if not poolship:
-            return JsonResponse({"message": "no poolship found"}, status=404)
+            return _not_found_response(id)
 
-        kwargs["moneypool"] = moneypool
+        kwargs["moneypool"] = poolship.moneypool
         kwargs["poolship"] = poolship
         return view_function(request, id, *args, **kwargs)
 
@@ -26,23 +51,16 @@ def is_moneypool_member(view_function):
 
 def is_moneypool_owner(view_function):
     def _decorated(request, id, *args, **kwargs):
-        moneypool = Moneypool.objects.filter(id=id).first()
-        if not moneypool:
-            return JsonResponse({"message": "no moneypool found"}, status=404)
-
-        poolship = Poolship.objects.filter(
-            moneypool=moneypool, member=request.user
-        ).first()
-
+        poolship = resolve_poolship(request, id)
         if not poolship:
-            return JsonResponse({"message": "no poolship found"}, status=404)
+            return _not_found_response(id)
 
-        if poolship.role != choice.MONEYPOOL_ROLE_OWNER:
+        if not is_owner(poolship):
             return JsonResponse(
                 {"message": "only owner are authorized to do the function"}, status=403
             )
 
-        kwargs["moneypool"] = moneypool
+        kwargs["moneypool"] = poolship.moneypool
         kwargs["poolship"] = poolship
         return view_function(request, id, *args, **kwargs)
 
@@ -51,27 +69,17 @@ def is_moneypool_owner(view_function):
 
 def is_moneypool_owner_or_manager(view_function):
     def _decorated(request, id, *args, **kwargs):
-        moneypool = Moneypool.objects.filter(id=id).first()
-        if not moneypool:
-            return JsonResponse({"message": "no moneypool found"}, status=404)
-
-        poolship = Poolship.objects.filter(
-            moneypool=moneypool, member=request.user
-        ).first()
-
+        poolship = resolve_poolship(request, id)
         if not poolship:
-            return JsonResponse({"message": "no poolship found"}, status=404)
+            return _not_found_response(id)
 
-        if not (
-            poolship.role == choice.MONEYPOOL_ROLE_OWNER
-            or poolship.role == choice.MONEYPOOL_ROLE_MANAGER
-        ):
+        if not is_owner_or_manager(poolship):
             return JsonResponse(
                 {"message": "only owner or manager are authorized to do the function"},
                 status=403,
             )
 
-        kwargs["moneypool"] = moneypool
+        kwargs["moneypool"] = poolship.moneypool
         kwargs["poolship"] = poolship
         return view_function(request, id, *args, **kwargs)
 
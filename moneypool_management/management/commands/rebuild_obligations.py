@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from moneypool_management.models import Installment, Moneypool
+from moneypool_management.models.obligation import (
+    sync_installment_obligation,
+    sync_moneypool_portion_obligations,
+)
+
+
+class Command(BaseCommand):
+    help = "rebuilds the obligation calendar of the active moneypools (e.g. after its first deploy)"
+
+    def handle(self, *args, **options):
+        moneypools = Moneypool.objects.filter(is_archived=False)
+        for moneypool in moneypools.iterator():
+            sync_moneypool_portion_obligations(moneypool)
+
+        installments = Installment.objects.filter(
+            cashin__isnull=True, loan__cashout__poolship__moneypool__in=moneypools
+        )
+        for installment in installments.iterator():
+            sync_installment_obligation(installment)
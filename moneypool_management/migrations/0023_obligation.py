@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moneypool_management', '0022_moneypoolcommission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Obligation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('removed', models.DateTimeField(blank=True, default=None, editable=False, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(verbose_name='Date')),
+                ('kind', models.CharField(choices=[('portion', 'Portion'), ('installment', 'Installment')], max_length=20, verbose_name='Kind')),
+                ('amount', models.IntegerField(default=0, verbose_name='Amount')),
+                ('is_settled', models.BooleanField(default=False, verbose_name='Is Settled')),
+                ('installment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='obligation', to='moneypool_management.Installment')),
+                ('moneypool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='obligations', to='moneypool_management.Moneypool')),
+                ('poolship', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='obligations', to='moneypool_management.Poolship')),
+            ],
+            options={
+                'verbose_name': 'obligation',
+                'verbose_name_plural': 'obligations',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='obligation',
+            index_together=set([('is_settled', 'kind', 'date')]),
+        ),
+    ]
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models
+from django.db.models.signals import post_save, pre_save
+from django.dispatch.dispatcher import receiver
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from utils.models import BaseModel
+
+OBLIGATION_KIND_PORTION = "portion"
+OBLIGATION_KIND_INSTALLMENT = "installment"
+OBLIGATION_KINDS = (
+    (OBLIGATION_KIND_PORTION, _("Portion")),
+    (OBLIGATION_KIND_INSTALLMENT, _("Installment")),
+)
+
+
+class Obligation(BaseModel):
+    """
+    the obligation calendar of the MONEYPOOLs, each row is an amount which a POOLSHIP should pay at a date
+    a POOLSHIP has one portion row per due date of its MONEYPOOL and one row per INSTALLMENT of its loans,
+    the rows are kept in sync when the due dates, the loans and the installments are created or paid,
+    so the reminders read only the due rows instead of walking every MONEYPOOL
+    the portion rows of the past due dates stay open (overdue) till the portions are paid off
+
+    FIELDS
+    date: the due date of the obligation
+    moneypool: the MONEYPOOL which the obligation is belonged
+    poolship: the POOLSHIP which should pay the obligation
+    kind: the choice represents the kind of the obligation values: portion, installment
+    installment: the INSTALLMENT of the obligation if its kind is installment
+    amount: the amount to be paid in Tomans
+    is_settled: the indicator says whether the obligation is paid (or is not due anymore) or not
+    """
+    date = models.DateField(_("Date"))
+    moneypool = models.ForeignKey(
+        "moneypool_management.Moneypool",
+        on_delete=models.CASCADE,
+        related_name="obligations",
+    )
+    poolship = models.ForeignKey(
+        "moneypool_management.Poolship",
+        on_delete=models.CASCADE,
+        related_name="obligations",
+    )
+    kind = models.CharField(_("Kind"), max_length=20, choices=OBLIGATION_KINDS)
+    installment = models.OneToOneField(
+        "moneypool_management.Installment",
+        on_delete=models.CASCADE,
+        related_name="obligation",
+        null=True,
+        blank=True,
+    )
+    amount = models.IntegerField(_("Amount"), default=0)
+    is_settled = models.BooleanField(_("Is Settled"), default=False)
+
+    class Meta:
+        verbose_name = _("obligation")
+        verbose_name_plural = _("obligations")
+        index_together = (("is_settled", "kind", "date"),)
+
+    def __str__(self):
+        return "%s (%s) %s>>%s" % (
+            self.kind, str(self.date), str(self.amount), self.poolship.__str__()
+        )
+
+    @classmethod
+    def get_due_moneypool_ids(cls, kind, overdue=False, date=None):
+        """
+        the distinct ids of the MONEYPOOLs which have open obligations of the kind due at the date
+        (or before it if overdue), as a subquery
+        :param date: the due date, today if None
+        """
+        if date is None:
+            date = timezone.localtime(timezone.now()).date()
+        date_lookup = {"date__lt": date} if overdue else {"date": date}
+        return (
+            cls.objects.filter(is_settled=False, kind=kind, **date_lookup)
+            .values("moneypool_id")
+            .distinct()
+        )
+
+
+def sync_portion_obligation(poolship):
+    """
+    (re)writes the portion obligation of the POOLSHIP for the current due date of its MONEYPOOL
+    the obligations of the former due dates are left as they are, unless the unpaid portion is paid off
+    (or the poolship is not due anymore), in which case all of them are settled
+    """
+    moneypool = poolship.moneypool
+    if moneypool.due_date is None:
+        return
+    amount = max(poolship.unpaid_portion, 0)
+    is_settled = (
+        amount == 0
+        or moneypool.is_archived
+        or not poolship.is_active
+        or poolship.removed is not None
+    )
+    Obligation.objects.update_or_create(
+        poolship=poolship,
+        kind=OBLIGATION_KIND_PORTION,
+        date=moneypool.due_date,
+        defaults={
+            "moneypool": moneypool,
+            "amount": amount,
+            "is_settled": is_settled,
+        },
+    )
+    if is_settled:
+        Obligation.objects.filter(
+            poolship=poolship, kind=OBLIGATION_KIND_PORTION, is_settled=False
+        ).update(is_settled=True)
+
+
+def sync_moneypool_portion_obligations(moneypool):
+    """
+    (re)writes the portion obligations of all POOLSHIPs of the MONEYPOOL
+    """
+    for poolship in moneypool.poolships.all():
+        poolship.moneypool = moneypool
+        sync_portion_obligation(poolship)
+
+
+def sync_installment_obligation(installment):
+    """
+    (re)writes the obligation of the INSTALLMENT
+    """
+    if installment.due_date is None:
+        return
+    poolship = installment.poolship
+    Obligation.objects.update_or_create(
+        installment=installment,
+        defaults={
+            "kind": OBLIGATION_KIND_INSTALLMENT,
+            "moneypool_id": poolship.moneypool_id,
+            "poolship": poolship,
+            "date": installment.due_date,
+            "amount": installment.amount,
+            "is_settled": installment.is_paid or installment.removed is not None,
+        },
+    )
+
+
+# the fields of a POOLSHIP which its portion obligation is derived from (besides its SHAREs)
+POOLSHIP_OBLIGATION_FIELDS = ("moneypool_id", "is_active", "removed")
+# the fields of a SHARE which the portion of its poolship is derived from
+SHARE_OBLIGATION_FIELDS = ("number", "start_date", "removed")
+# the fields which a MONEYPOOL CASHIN pays the portion obligation of its poolship by
+CASHIN_OBLIGATION_FIELDS = ("poolship_id", "amount", "time")
+
+
+def has_changed(sender, instance, fields, update_fields=None):
+    """
+    whether the instance is new or any of the fields differs from its saved row
+    """
+    if instance.pk is None:
+        return True
+    if update_fields is not None:
+        # the update fields name the foreign keys without their _id suffix
+        names = set(fields) | {field[:-len("_id")] for field in fields if field.endswith("_id")}
+        if not names & set(update_fields):
+            return False
+    return not sender.objects.filter(
+        pk=instance.pk, **{field: getattr(instance, field) for field in fields}
+    ).exists()
+
+
+@receiver(pre_save, sender="moneypool_management.Moneypool")
+def mark_due_date_change(sender, instance, **kwargs):
+    # the portions are re-synced only when the due date rolls or the moneypool is (un)archived
+    instance._obligations_changed = has_changed(sender, instance, ("due_date", "is_archived"))
+
+
+@receiver(post_save, sender="moneypool_management.Moneypool")
+def sync_moneypool_obligations(sender, instance, created, **kwargs):
+    if not instance.__dict__.pop("_obligations_changed", False) or created:
+        return
+    sync_moneypool_portion_obligations(instance)
+
+
+@receiver(pre_save, sender="moneypool_management.Poolship")
+def mark_poolship_change(sender, instance, update_fields=None, **kwargs):
+    instance._obligations_changed = has_changed(
+        sender, instance, POOLSHIP_OBLIGATION_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender="moneypool_management.Poolship")
+def sync_poolship_obligations(sender, instance, **kwargs):
+    if instance.__dict__.pop("_obligations_changed", False):
+        sync_portion_obligation(instance)
+
+
+@receiver(pre_save, sender="moneypool_management.Share")
+def mark_share_change(sender, instance, update_fields=None, **kwargs):
+    instance._obligations_changed = has_changed(
+        sender, instance, SHARE_OBLIGATION_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender="moneypool_management.Share")
+def sync_share_obligations(sender, instance, **kwargs):
+    if instance.__dict__.pop("_obligations_changed", False):
+        sync_portion_obligation(instance.poolship)
+
+
+@receiver(pre_save, sender="payment.MoneypoolCashin")
+def mark_cashin_change(sender, instance, update_fields=None, **kwargs):
+    instance._obligations_changed = has_changed(
+        sender, instance, CASHIN_OBLIGATION_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender="payment.MoneypoolCashin")
+def sync_cashin_obligations(sender, instance, **kwargs):
+    if instance.__dict__.pop("_obligations_changed", False) and instance.poolship_id is not None:
+        sync_portion_obligation(instance.poolship)
+
+
+@receiver(post_save, sender="moneypool_management.Installment")
+def sync_installment_obligations(sender, instance, **kwargs):
+    sync_installment_obligation(instance)
@@ -1,16 +1,24 @@
 import csv
+import time
+from collections import OrderedDict, defaultdict
 from datetime import timedelta
 
-from celery import shared_task
+from celery import chord, shared_task
 from celery.schedules import crontab
 from celery.task import periodic_task
 from django.conf import settings
 from django.core.mail import EmailMessage, send_mail
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from khayyam import JalaliDate
 
-from moneypool_management.models import Moneypool
+from moneypool_management.models import Moneypool, Poolship
+from moneypool_management.models.obligation import (
+    OBLIGATION_KIND_INSTALLMENT,
+    OBLIGATION_KIND_PORTION,
+    Obligation,
+)
 from moneypool_management.utils import announcement_utils as announce
 from moneypool_management.utils.moneypool_utils import (
     get_moneypool_as_string,
@@ -26,98 +34,146 @@ from utils.mixins import persian
 from .utils.service_package import get_last_successful_order
 
 
-@periodic_task(
-    run_every=(crontab(hour="9", minute="00")),
-    name="moneypool_send_pay_portion_reminder_announcements",
-    ignore_results=True,
-    queue=choice.CELERY_PERIODIC_QUEUE,
-    options={'queue': choice.CELERY_PERIODIC_QUEUE},
-)
-def moneypool_send_pay_portion_reminder_announcements():
-    if settings.DEBUG:
-        return
-    info_logger.info("Task moneypool_send_pay_portion_reminder_announcements")
-    all_active_moneypools = Moneypool.objects.filter(is_archived=False)
-    for moneypool in all_active_moneypools:
-        try:
-            announce.send_pay_portion_reminder_message(moneypool)
-            announce.send_pay_portion_reminder_notification(moneypool)
-            announce.send_pay_portion_reminder_smses(moneypool)
-        except Exception as e:
-            error_logger.error("MP pay portion reminder... id: %s, e: %s"
-                               % (str(moneypool.id), str(e)))
+MONEYPOOL_REMINDERS_CHUNK_SIZE = 50
+MONEYPOOL_REMINDER_PAY_PORTION = "pay_portion"
+MONEYPOOL_REMINDER_DELAYED_PAY_PORTION = "delayed_pay_portion"
+MONEYPOOL_REMINDER_PAY_INSTALLMENT = "pay_installment"
+MONEYPOOL_REMINDER_DELAYED_PAY_INSTALLMENT = "delayed_pay_installment"
+# the announcements of each reminder in the order they are sent
+MONEYPOOL_REMINDER_ANNOUNCEMENTS = OrderedDict((
+    (MONEYPOOL_REMINDER_PAY_PORTION, (
+        announce.send_pay_portion_reminder_message,
+        announce.send_pay_portion_reminder_notification,
+        announce.send_pay_portion_reminder_smses,
+    )),
+    (MONEYPOOL_REMINDER_DELAYED_PAY_PORTION, (
+        announce.send_pay_delayed_portion_reminder_message,
+        announce.send_pay_delayed_portion_reminder_notification,
+        announce.send_inform_pay_delayed_portion_reminder_message,
+        announce.send_inform_pay_delayed_portion_reminder_notification,
+    )),
+    (MONEYPOOL_REMINDER_PAY_INSTALLMENT, (
+        announce.send_pay_installment_reminder_message,
+        announce.send_pay_installment_reminder_notification,
+        announce.send_pay_installment_reminder_smses,
+    )),
+    (MONEYPOOL_REMINDER_DELAYED_PAY_INSTALLMENT, (
+        announce.send_pay_delayed_installment_reminder_message,
+        announce.send_pay_delayed_installment_reminder_notification,
+        announce.send_inform_pay_delayed_installment_reminder_message,
+        announce.send_inform_pay_delayed_installment_reminder_notification,
+    )),
+))
+
+
+def get_due_moneypool_reminders(date=None):
+    """
+    the reminders of the active MONEYPOOLs which have open obligations due at the date or before it,
+    read from the obligation calendar with one query
+    :param date: the date of the reminders, today if None
+    :return: a list of [moneypool id, list of reminders] in moneypool id order
+    """
+    if date is None:
+        date = timezone.localtime(timezone.now()).date()
+    obligations = (
+        Obligation.objects.filter(
+            is_settled=False, date__lte=date, moneypool__is_archived=False
+        )
+        .values_list("moneypool_id", "kind", "date")
+        .distinct()
+    )
+    reminders = defaultdict(set)
+    for moneypool_id, kind, due_date in obligations:
+        if kind == OBLIGATION_KIND_PORTION:
+            reminders[moneypool_id].add(
+                MONEYPOOL_REMINDER_PAY_PORTION if due_date == date
+                else MONEYPOOL_REMINDER_DELAYED_PAY_PORTION
+            )
+        elif kind == OBLIGATION_KIND_INSTALLMENT:
+            reminders[moneypool_id].add(
+                MONEYPOOL_REMINDER_PAY_INSTALLMENT if due_date == date
+                else MONEYPOOL_REMINDER_DELAYED_PAY_INSTALLMENT
+            )
+    return [
+        [moneypool_id, [reminder for reminder in MONEYPOOL_REMINDER_ANNOUNCEMENTS
+                        if reminder in reminders[moneypool_id]]]
+        for moneypool_id in sorted(reminders)
+    ]
 
 
 @periodic_task(
-    run_every=(crontab(hour="9", minute="10")),
-    name="moneypool_send_delayed_pay_portion_reminder_announcements",
+    run_every=(crontab(hour="9", minute="00")),
+    name="moneypool_send_reminder_announcements",
     ignore_results=True,
     queue=choice.CELERY_PERIODIC_QUEUE,
     options={'queue': choice.CELERY_PERIODIC_QUEUE},
 )
-def moneypool_send_delayed_pay_portion_reminder_announcements():
+def moneypool_send_reminder_announcements():
+    """
+    splits the due moneypools into chunks and fans them out to the periodic workers,
+    the summary of the chunks is logged when all of them are done
+    """
     if settings.DEBUG:
         return
-    info_logger.info("Task moneypool_send_delayed_pay_portion_reminder_announcements")
-    all_active_moneypools = Moneypool.objects.filter(is_archived=False)
-    for moneypool in all_active_moneypools:
-        try:
-            announce.send_pay_delayed_portion_reminder_message(moneypool)
-            announce.send_pay_delayed_portion_reminder_notification(moneypool)
-
-            announce.send_inform_pay_delayed_portion_reminder_message(moneypool)
-            announce.send_inform_pay_delayed_portion_reminder_notification(moneypool)
-        except Exception as e:
-            error_logger.error("MP delayed pay portion reminder... id: %s, e: %s"
-                               % (str(moneypool.id), str(e)))
-
-
-@periodic_task(
-    run_every=(crontab(hour="9", minute="20")),
-    name="moneypool_send_pay_installment_reminder_announcements",
-    ignore_results=True,
-    queue=choice.CELERY_PERIODIC_QUEUE,
-    options={'queue': choice.CELERY_PERIODIC_QUEUE},
-)
-def moneypool_send_pay_installment_reminder_announcements():
-    if settings.DEBUG:
+    info_logger.info("Task moneypool_send_reminder_announcements")
+    due_reminders = get_due_moneypool_reminders()
+    if len(due_reminders) == 0:
         return
-    info_logger.info("Task moneypool_send_pay_installment_reminder_announcements")
-    all_active_moneypools = Moneypool.objects.filter(is_archived=False)
-    for moneypool in all_active_moneypools:
-        try:
-            announce.send_pay_installment_reminder_message(moneypool)
-            announce.send_pay_installment_reminder_notification(moneypool)
-            announce.send_pay_installment_reminder_smses(moneypool)
-        except Exception as e:
-            error_logger.error("MP pay installment reminder... id: %s, e: %s"
-                               % (str(moneypool.id), str(e)))
+    chunks = [
+        due_reminders[i:i + MONEYPOOL_REMINDERS_CHUNK_SIZE]
+        for i in range(0, len(due_reminders), MONEYPOOL_REMINDERS_CHUNK_SIZE)
+    ]
+    chord(
+        send_moneypool_reminder_announcements_chunk.s(chunk) for chunk in chunks
+    )(report_moneypool_reminder_announcements.s())
 
 
-@periodic_task(
-    run_every=(crontab(hour="9", minute="30")),
-    name="moneypool_send_delayed_pay_installment_reminder_announcements",
-    ignore_results=True,
-    queue=choice.CELERY_PERIODIC_QUEUE,
-    options={'queue': choice.CELERY_PERIODIC_QUEUE},
-)
-def moneypool_send_delayed_pay_installment_reminder_announcements():
-    if settings.DEBUG:
-        return
+@shared_task(queue=choice.CELERY_PERIODIC_QUEUE)
+def send_moneypool_reminder_announcements_chunk(due_reminders):
+    """
+    sends all of the due reminders of the chunk's moneypools in one pass
+    the moneypools are loaded with their poolships (and members) prefetched once for the chunk,
+    so the announcements of every reminder reuse them instead of querying per reminder
+    :param due_reminders: a list of [moneypool id, list of reminders]
+    :return: the stats of the chunk (moneypools, failures and the duration in seconds)
+    """
+    start_time = time.monotonic()
+    moneypools = Moneypool.objects.prefetch_related(
+        Prefetch("poolships", queryset=Poolship.objects.select_related("member"))
+    ).in_bulk([moneypool_id for moneypool_id, _ in due_reminders])
+    failures = 0
+    for moneypool_id, reminders in due_reminders:
+        moneypool = moneypools.get(moneypool_id)
+        if moneypool is None:
+            continue
+        for reminder in reminders:
+            try:
+                for send_announcement in MONEYPOOL_REMINDER_ANNOUNCEMENTS[reminder]:
+                    send_announcement(moneypool)
+            except Exception as e:
+                failures += 1
+                error_logger.error("MP %s reminder... id: %s, e: %s"
+                                   % (reminder, str(moneypool_id), str(e)))
+    return {
+        "moneypools": len(due_reminders),
+        "failures": failures,
+        "duration": time.monotonic() - start_time,
+    }
+
+
+@shared_task(queue=choice.CELERY_PERIODIC_QUEUE)
+def report_moneypool_reminder_announcements(chunks_stats):
     info_logger.info(
-        "Task moneypool_send_delayed_pay_installment_reminder_announcements"
+        "MP reminders done... chunks: %s, moneypools: %s, failures: %s, "
+        "slowest chunk: %.1fs, total chunks time: %.1fs"
+        % (
+            len(chunks_stats),
+            sum(stats["moneypools"] for stats in chunks_stats),
+            sum(stats["failures"] for stats in chunks_stats),
+            max(stats["duration"] for stats in chunks_stats),
+            sum(stats["duration"] for stats in chunks_stats),
+        )
     )
-    all_active_moneypools = Moneypool.objects.filter(is_archived=False)
-    for moneypool in all_active_moneypools:
-        try:
-            announce.send_pay_delayed_installment_reminder_message(moneypool)
-            announce.send_pay_delayed_installment_reminder_notification(moneypool)
-
-            announce.send_inform_pay_delayed_installment_reminder_message(moneypool)
-            announce.send_inform_pay_delayed_installment_reminder_notification(moneypool)
-        except Exception as e:
-            error_logger.error("MP delayed pay installment reminder... id: %s, e: %s"
-                               % (str(moneypool.id), str(e)))
 
 
 # @periodic_task(
@@ -0,0 +1,28 @@
+from datetime import date
+from unittest import mock
+
+from account_management.models import Member
+from moneypool_management.models import Moneypool, Poolship
+from utils.constants import choice
+
+
+def mock_unpaid_portion(test_case, unpaid_portion=0):
+    """
+    mocks the unpaid portion of the POOLSHIPs for the test, which their saves sync the obligations by
+    """
+    patcher = mock.patch.object(
+        Poolship, "unpaid_portion", new_callable=mock.PropertyMock, return_value=unpaid_portion
+    )
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+def create_moneypool(name="test moneypool", due_date=date(2020, 1, 1), **kwargs):
+    return Moneypool.objects.create(name=name, due_date=due_date, **kwargs)
+
+
+def create_poolship(moneypool, phone_number, role=choice.MONEYPOOL_ROLE_NORMAL, **kwargs):
+    member = Member.objects.create(phone_number=phone_number)
+    return Poolship.objects.create(
+        moneypool=moneypool, member=member, role=role, is_active=True, **kwargs
+    )
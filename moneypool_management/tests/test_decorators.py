@@ -0,0 +1,65 @@
+import json
+
+from django.http.response import JsonResponse
+from django.test import RequestFactory, TestCase
+
+from account_management.models import Member
+from moneypool_management.decorators import (
+    is_moneypool_member,
+    is_moneypool_owner,
+    is_moneypool_owner_or_manager,
+)
+from moneypool_management.tests.factories import (
+    create_moneypool,
+    create_poolship,
+    mock_unpaid_portion,
+)
+from utils.constants import choice
+
+
+def view(request, id, *args, **kwargs):
+    return JsonResponse({"poolship": kwargs["poolship"].id}, status=200)
+
+
+class MoneypoolDecoratorsTest(TestCase):
+    def setUp(self):
+        mock_unpaid_portion(self)
+
+        self.moneypool = create_moneypool()
+        self.owner = create_poolship(self.moneypool, "09120000001", choice.MONEYPOOL_ROLE_OWNER)
+        self.manager = create_poolship(self.moneypool, "09120000004", choice.MONEYPOOL_ROLE_MANAGER)
+        self.normal = create_poolship(self.moneypool, "09120000002")
+
+    def get(self, decorator, member, id=None):
+        request = RequestFactory().get("/")
+        request.user = member
+        return decorator(view)(request, id or self.moneypool.id)
+
+    def test_nested_decorators_resolve_the_poolship_once(self):
+        request = RequestFactory().get("/")
+        request.user = self.owner.member
+        decorated = is_moneypool_member(is_moneypool_owner(is_moneypool_owner_or_manager(view)))
+
+        with self.assertNumQueries(1):
+            response = decorated(request, self.moneypool.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode())["poolship"], self.owner.id)
+
+    def test_owner_or_manager_uses_the_poolship_role(self):
+        self.assertEqual(self.get(is_moneypool_owner_or_manager, self.owner.member).status_code, 200)
+        self.assertEqual(self.get(is_moneypool_owner_or_manager, self.manager.member).status_code, 200)
+        self.assertEqual(self.get(is_moneypool_owner, self.manager.member).status_code, 403)
+        self.assertEqual(self.get(is_moneypool_owner_or_manager, self.normal.member).status_code, 403)
+        self.assertEqual(self.get(is_moneypool_owner, self.normal.member).status_code, 403)
+
+    def test_not_found_messages(self):
+        stranger = Member.objects.create(phone_number="09120000003")
+
+        response = self.get(is_moneypool_member, stranger)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content.decode())["message"], "no poolship found")
+
+        response = self.get(is_moneypool_member, stranger, id=self.moneypool.id + 1000)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content.decode())["message"], "no moneypool found")
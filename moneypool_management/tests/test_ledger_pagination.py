@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from moneypool_management.tests.factories import (
+    create_moneypool,
+    create_poolship,
+    mock_unpaid_portion,
+)
+from moneypool_management.utils.ledger_utils import (
+    LEDGER_KIND_CASHIN,
+    LEDGER_KIND_CASHOUT,
+    decode_ledger_cursor,
+    encode_ledger_cursor,
+    get_ledger_rows,
+)
+from payment.models import MoneypoolCashin, MoneypoolCashout
+from utils.constants import choice
+
+
+class LedgerCursorTest(SimpleTestCase):
+    def test_round_trip(self):
+        row = (datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc), LEDGER_KIND_CASHOUT, 42)
+        self.assertEqual(decode_ledger_cursor(encode_ledger_cursor(row)), row)
+
+    def test_malformed_cursors(self):
+        for cursor in (None, "", "abc", "1_cashin", "1_cashin_x", "x_cashin_1", "1_loan_1",
+                       "1_cashin_1_2", "%d_cashin_1" % 10 ** 30):
+            self.assertIsNone(decode_ledger_cursor(cursor), cursor)
+
+
+class LedgerPaginationTest(TestCase):
+    def setUp(self):
+        mock_unpaid_portion(self)
+
+        moneypool = create_moneypool()
+        poolship = create_poolship(moneypool, "09120000001", role=choice.MONEYPOOL_ROLE_OWNER)
+        tie = datetime(2020, 1, 1, 12, tzinfo=timezone.utc)
+        # the rows of both kinds share the same time, so only the kind and the id order them
+        for time in (tie, tie, tie, tie - timedelta(seconds=1), tie + timedelta(seconds=1)):
+            MoneypoolCashin.objects.create(
+                registrar=poolship, poolship=poolship, amount=1000, time=time,
+                type=choice.MONEYPOOL_CASHIN_TYPE_REPAYMENT,
+            )
+            MoneypoolCashout.objects.create(
+                registrar=poolship, poolship=poolship, amount=1000, time=time,
+                type=choice.MONEYPOOL_CASHOUT_TYPE_CUSTOM,
+            )
+        self.cashins = MoneypoolCashin.objects.filter(poolship__moneypool=moneypool)
+        self.cashouts = MoneypoolCashout.objects.filter(poolship__moneypool=moneypool)
+
+    def walk(self, page_size):
+        rows, cursor = [], None
+        while True:
+            page = list(get_ledger_rows(self.cashins, self.cashouts, cursor)[:page_size])
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            # the cursor goes through its string form, as the clients send it back
+            cursor = decode_ledger_cursor(encode_ledger_cursor(page[-1]))
+
+    def test_pages_split_on_ties_walk_every_row_once(self):
+        expected = sorted(
+            [(time, LEDGER_KIND_CASHIN, id) for id, time in self.cashins.values_list("id", "time")]
+            + [(time, LEDGER_KIND_CASHOUT, id) for id, time in self.cashouts.values_list("id", "time")],
+            reverse=True,
+        )
+        self.assertEqual(len(expected), 10)
+        for page_size in (1, 2, 3, 4, 10, 11):
+            self.assertEqual(self.walk(page_size), expected, page_size)
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from moneypool_management.models import Poolship
+from moneypool_management.tests.factories import (
+    create_moneypool,
+    create_poolship,
+    mock_unpaid_portion,
+)
+from moneypool_management.views import moneypool_function_views
+from utils.constants import choice
+
+
+def moneypool_data(moneypool, member, should_fail):
+    # reads the relations which the list loads up front, as the moneypool data does
+    return {
+        "id": moneypool.id,
+        "abonnement": moneypool.abonnement,
+        "members": [poolship.member.phone_number for poolship in moneypool.poolships.all()],
+    }
+
+
+class MoneypoolListDataTest(TestCase):
+    def setUp(self):
+        mock_unpaid_portion(self)
+        get_moneypool_data = mock.patch.object(
+            moneypool_function_views, "get_moneypool_data", side_effect=moneypool_data
+        )
+        get_moneypool_data.start()
+        self.addCleanup(get_moneypool_data.stop)
+
+        # the due dates are not reached, so the list does not roll them
+        self.due_date = timezone.localtime(timezone.now()).date() + timedelta(30)
+        self.member = create_poolship(
+            self.create_moneypool(0), "09120000000", role=choice.MONEYPOOL_ROLE_OWNER
+        ).member
+
+    def create_moneypool(self, index):
+        moneypool = create_moneypool(name="test moneypool %d" % index, due_date=self.due_date)
+        for j in range(1, 3):
+            create_poolship(moneypool, "0912000%02d%02d" % (index, j))
+        return moneypool
+
+    def get_moneypool_list_data(self):
+        return moneypool_function_views.get_moneypool_list_data(self.member)
+
+    def test_queries_do_not_grow_with_the_moneypools(self):
+        with CaptureQueriesContext(connection) as one_moneypool_queries:
+            self.assertEqual(len(self.get_moneypool_list_data()), 1)
+
+        for index in range(1, 4):
+            Poolship.objects.create(
+                moneypool=self.create_moneypool(index),
+                member=self.member,
+                role=choice.MONEYPOOL_ROLE_NORMAL,
+                is_active=True,
+            )
+
+        with self.assertNumQueries(len(one_moneypool_queries)):
+            moneypools_data = self.get_moneypool_list_data()
+
+        self.assertEqual(len(moneypools_data), 4)
+        self.assertEqual([len(data["members"]) for data in moneypools_data], [3] * 4)
@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.test import TestCase
+
+from moneypool_management.models import Poolship
+from moneypool_management.models.obligation import (
+    OBLIGATION_KIND_PORTION,
+    Obligation,
+    sync_portion_obligation,
+)
+from moneypool_management.tests.factories import (
+    create_moneypool,
+    create_poolship,
+    mock_unpaid_portion,
+)
+from utils.constants import choice
+
+
+class PortionObligationTest(TestCase):
+    def setUp(self):
+        self.first_due_date = date(2020, 1, 1)
+        self.second_due_date = self.first_due_date + timedelta(30)
+        mock_unpaid_portion(self, 1000)
+
+        self.moneypool = create_moneypool(due_date=self.first_due_date)
+        self.poolship = create_poolship(
+            self.moneypool, "09120000001", role=choice.MONEYPOOL_ROLE_OWNER
+        )
+
+    def roll_due_date(self):
+        self.moneypool.due_date = self.second_due_date
+        self.moneypool.save()
+
+    def open_portion_dates(self):
+        return list(
+            Obligation.objects.filter(
+                poolship=self.poolship, kind=OBLIGATION_KIND_PORTION, is_settled=False
+            ).order_by("date").values_list("date", flat=True)
+        )
+
+    def test_unpaid_portion_stays_overdue_after_the_due_date_rolls(self):
+        self.roll_due_date()
+
+        self.assertEqual(self.open_portion_dates(), [self.first_due_date, self.second_due_date])
+        self.assertIn(
+            self.moneypool.id,
+            Obligation.get_due_moneypool_ids(
+                OBLIGATION_KIND_PORTION, overdue=True, date=self.second_due_date
+            ).values_list("moneypool_id", flat=True),
+        )
+        self.assertIn(
+            self.moneypool.id,
+            Obligation.get_due_moneypool_ids(
+                OBLIGATION_KIND_PORTION, date=self.second_due_date
+            ).values_list("moneypool_id", flat=True),
+        )
+
+    def test_only_the_portion_changes_sync_the_poolship(self):
+        with mock.patch(
+                "moneypool_management.models.obligation.sync_portion_obligation"
+        ) as sync_portion_obligation:
+            self.poolship.save()
+            self.poolship.save(update_fields=["role"])
+            sync_portion_obligation.assert_not_called()
+
+            self.poolship.is_active = False
+            self.poolship.save()
+            sync_portion_obligation.assert_called_once_with(self.poolship)
+
+    def test_paying_off_settles_the_former_due_dates(self):
+        self.roll_due_date()
+
+        with mock.patch.object(
+                Poolship, "unpaid_portion", new_callable=mock.PropertyMock, return_value=0
+        ):
+            sync_portion_obligation(self.poolship)
+
+        self.assertEqual(self.open_portion_dates(), [])
+        self.assertEqual(
+            Obligation.objects.filter(poolship=self.poolship, kind=OBLIGATION_KIND_PORTION).count(),
+            2,
+        )
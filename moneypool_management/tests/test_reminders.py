@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from unittest import mock
+
+from django.test import TestCase
+
+from moneypool_management import tasks
+from moneypool_management.tests.factories import (
+    create_moneypool,
+    create_poolship,
+    mock_unpaid_portion,
+)
+from utils.constants import choice
+
+
+class ReminderChunkTest(TestCase):
+    def setUp(self):
+        mock_unpaid_portion(self)
+
+        self.moneypools = []
+        for i in range(3):
+            moneypool = create_moneypool(name="test moneypool %d" % i)
+            for j in range(3):
+                create_poolship(
+                    moneypool,
+                    "0912000%02d%02d" % (i, j),
+                    role=choice.MONEYPOOL_ROLE_OWNER if j == 0 else choice.MONEYPOOL_ROLE_NORMAL,
+                )
+            self.moneypools.append(moneypool)
+        self.receivers = []
+
+    def announce(self, moneypool):
+        self.receivers.extend(
+            poolship.member.phone_number for poolship in moneypool.poolships.all()
+        )
+
+    def test_chunk_loads_poolships_and_members_once(self):
+        announcements = OrderedDict((
+            (tasks.MONEYPOOL_REMINDER_PAY_PORTION, (self.announce, self.announce)),
+            (tasks.MONEYPOOL_REMINDER_PAY_INSTALLMENT, (self.announce,)),
+        ))
+        due_reminders = [
+            [moneypool.id, [tasks.MONEYPOOL_REMINDER_PAY_PORTION,
+                            tasks.MONEYPOOL_REMINDER_PAY_INSTALLMENT]]
+            for moneypool in self.moneypools
+        ]
+
+        with mock.patch.object(tasks, "MONEYPOOL_REMINDER_ANNOUNCEMENTS", announcements):
+            # one query for the moneypools and one for their poolships with the members
+            with self.assertNumQueries(2):
+                stats = tasks.send_moneypool_reminder_announcements_chunk(due_reminders)
+
+        self.assertEqual(stats["moneypools"], 3)
+        self.assertEqual(stats["failures"], 0)
+        self.assertEqual(len(self.receivers), 3 * 3 * 3)
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+from django.db.models import CharField, Q, Value
+from django.utils import timezone
+
+from payment.models import MoneypoolCashin, MoneypoolCashout
+from payment.serializers.moneypool_cashin_serializer import (
+    OpenMoneypoolCashinSerializer,
+    RestrictedMoneypoolCashinSerializer,
+)
+from payment.serializers.moneypool_cashout_serializer import (
+    OpenMoneypoolCashoutSerializer,
+    RestrictedMoneypoolCashoutSerializer,
+)
+
+LEDGER_KIND_CASHIN = "cashin"
+LEDGER_KIND_CASHOUT = "cashout"
+# the ledger is ordered by (time, kind, id) descending, so the rows with the same time keep a stable order
+LEDGER_ORDERING = ("-time", "-kind", "-id")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_ledger_cursor(row):
+    """
+    the opaque cursor of a (time, kind, id) ledger row, which the next page starts after
+    """
+    time, kind, id = row
+    delta = time - _EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return "%d_%s_%d" % (microseconds, kind, id)
+
+
+def decode_ledger_cursor(cursor):
+    """
+    :return: the (time, kind, id) of the cursor or None if it is not valid
+    """
+    try:
+        microseconds, kind, id = cursor.split("_")
+        time = _EPOCH + timedelta(microseconds=int(microseconds))
+        id = int(id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    if kind not in (LEDGER_KIND_CASHIN, LEDGER_KIND_CASHOUT):
+        return None
+    return time, kind, id
+
+
+def _after_cursor(rows, kind, cursor):
+    """
+    the rows of one side of the ledger (all of the same kind) which come after the cursor
+    """
+    if cursor is None:
+        return rows
+    time, cursor_kind, id = cursor
+    condition = Q(time__lt=time)
+    if kind < cursor_kind:
+        condition |= Q(time=time)
+    elif kind == cursor_kind:
+        condition |= Q(time=time, id__lt=id)
+    return rows.filter(condition)
+
+
+def get_ledger_rows(cashins, cashouts, cursor=None):
+    """
+    the UNION of the cashins and the cashouts as (time, kind, id) rows ordered by time in the database
+    :param cursor: the decoded cursor which the rows start after, None for the first row
+    :return: a lazy queryset of the rows, to be sliced for a page
+    """
+    cashin_rows = _after_cursor(cashins, LEDGER_KIND_CASHIN, cursor).annotate(
+        kind=Value(LEDGER_KIND_CASHIN, output_field=CharField())
+    ).values_list("time", "kind", "id").order_by()
+    cashout_rows = _after_cursor(cashouts, LEDGER_KIND_CASHOUT, cursor).annotate(
+        kind=Value(LEDGER_KIND_CASHOUT, output_field=CharField())
+    ).values_list("time", "kind", "id").order_by()
+    # the sides must not be ordered on their own, the union is ordered as a whole
+    return cashin_rows.union(cashout_rows, all=True).order_by(*LEDGER_ORDERING)
+
+
+def serialize_ledger_rows(rows, is_open):
+    """
+    serializes just the cashins and cashouts of the rows (with their poolship, member and transaction
+    loaded in one query per kind) in the order of the rows
+    :param is_open: whether to use the open serializers (for the managers) or the restricted ones
+    """
+    ids = {LEDGER_KIND_CASHIN: [], LEDGER_KIND_CASHOUT: []}
+    for _, kind, id in rows:
+        ids[kind].append(id)
+    objects = {
+        LEDGER_KIND_CASHIN: MoneypoolCashin.objects.select_related(
+            "poolship__member", "transaction"
+        ).in_bulk(ids[LEDGER_KIND_CASHIN]),
+        LEDGER_KIND_CASHOUT: MoneypoolCashout.objects.select_related(
+            "poolship__member", "transaction"
+        ).in_bulk(ids[LEDGER_KIND_CASHOUT]),
+    }
+    serializers = {
+        LEDGER_KIND_CASHIN: (
+            OpenMoneypoolCashinSerializer if is_open else RestrictedMoneypoolCashinSerializer
+        ),
+        LEDGER_KIND_CASHOUT: (
+            OpenMoneypoolCashoutSerializer if is_open else RestrictedMoneypoolCashoutSerializer
+        ),
+    }
+    return [
+        serializers[kind](objects[kind][id]).data
+        for _, kind, id in rows
+        if id in objects[kind]
+    ]
@@ -1,7 +1,7 @@
 import json
 
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.http.response import JsonResponse
 from django.utils import timezone
 from rest_framework import permissions, status
@@ -24,16 +24,14 @@ from moneypool_management.models import Moneypool, Loan, Poolship
 from moneypool_management.serializers.loan_serializer import LoanSerializer
 from moneypool_management.serializers.moneypool_serializer import MoneypoolSerializer
 from moneypool_management.utils import announcement_utils as announce
+from moneypool_management.utils.ledger_utils import (
+    decode_ledger_cursor,
+    encode_ledger_cursor,
+    get_ledger_rows,
+    serialize_ledger_rows,
+)
 from moneypool_management.utils.moneypool_utils import get_moneypool_data
 from payment.models import MoneypoolCashin, MoneypoolCashout
-from payment.serializers.moneypool_cashin_serializer import (
-    OpenMoneypoolCashinSerializer,
-    RestrictedMoneypoolCashinSerializer,
-)
-from payment.serializers.moneypool_cashout_serializer import (
-    OpenMoneypoolCashoutSerializer,
-    RestrictedMoneypoolCashoutSerializer,
-)
 from payment.utils import transfer_hamyan_balance_to_bank
 from utils import throttle
 from utils.constants import default, choice
@@ -151,33 +149,47 @@ def get_moneypool(request, id, *args, **kwargs):
     )
 
 
-@api_view(["GET"])
-@throttle_classes(
-    [throttle.UserMinuteRate, throttle.UserHourRate, throttle.UserDayRate]
-)
-@permission_classes((permissions.IsAuthenticated,))
-@renderer_classes(
-    [renderers.OpenAPIRenderer, renderers.SwaggerUIRenderer, renderers.JSONRenderer]
-)
-def moneypool_list(request):
+def get_moneypool_list_data(member):
+    """
+    the data of the active moneypools of the member, as the moneypool list shows them
+    the moneypools are loaded once with their poolships (and members) and abonnement prefetched
+    in a fixed number of queries, so the per moneypool data reuses them instead of querying again
+    :return: a list of the moneypool data dicts
+    """
     moneypools = (
         Moneypool.objects.filter(
             Q(is_archived=False)
-            & Q(poolships__member=request.user)
+            & Q(poolships__member=member)
         ).distinct().order_by("-created")
     )
-    results = dict()
     moneypools.check_and_update_due_dates()
-    results["moneypools"] = []
+    moneypools = moneypools.select_related("abonnement").prefetch_related(
+        Prefetch("poolships", queryset=Poolship.objects.select_related("member"))
+    )
+    moneypools_data = []
     for moneypool in moneypools:
         moneypool_data = get_moneypool_data(
             moneypool=moneypool,
-            member=request.user,
+            member=member,
             should_fail=True
         )
         if moneypool_data == -1:
             continue
-        results["moneypools"].append(moneypool_data)
+        moneypools_data.append(moneypool_data)
+    return moneypools_data
+
+
+@api_view(["GET"])
+@throttle_classes(
+    [throttle.UserMinuteRate, throttle.UserHourRate, throttle.UserDayRate]
+)
+@permission_classes((permissions.IsAuthenticated,))
+@renderer_classes(
+    [renderers.OpenAPIRenderer, renderers.SwaggerUIRenderer, renderers.JSONRenderer]
+)
+def moneypool_list(request):
+    results = dict()
+    results["moneypools"] = get_moneypool_list_data(request.user)
     return generate_json_ok_response(response=2050, results=results)
 
 
@@ -190,14 +202,11 @@ def moneypool_list(request):
     [renderers.OpenAPIRenderer, renderers.SwaggerUIRenderer, renderers.JSONRenderer]
 )
 def moneypool_and_cashbox_list(request):
-    moneypool_list_response = json.loads(
-        moneypool_list(request).content.decode("UTF-8")
-    )
     cashbox_list_response = json.loads(
         cashbox_list(request).content.decode("UTF-8")
     )
     results = dict()
-    results["moneypools"] = moneypool_list_response.get("results").get("moneypools")
+    results["moneypools"] = get_moneypool_list_data(request.user)
     results["cashboxes"] = cashbox_list_response.get("results")
     return generate_json_ok_response(response=2050, results=results)
 
@@ -300,7 +309,6 @@ def list_moneypool_cashins_and_cashouts(request, id, *args, **kwargs):
     caller_poolship = kwargs["poolship"]
     assert isinstance(moneypool, Moneypool)
     assert isinstance(caller_poolship, Poolship)
-    result_list = list()
     cashins = MoneypoolCashin.objects.filter(
         Q(poolship__moneypool=moneypool)
         & (Q(transaction__isnull=True)
@@ -329,45 +337,43 @@ def list_moneypool_cashins_and_cashouts(request, id, *args, **kwargs):
             Q(poolship__member__first_name__contains=query)
             | Q(poolship__member__last_name__contains=query)
         )
-    if caller_poolship.is_manager:
-        result_list = OpenMoneypoolCashinSerializer(cashins, many=True).data
-        result_list += OpenMoneypoolCashoutSerializer(cashouts, many=True).data
-    else:
-        result_list = RestrictedMoneypoolCashinSerializer(cashins, many=True).data
-        result_list += RestrictedMoneypoolCashoutSerializer(cashouts, many=True).data
-    # for cashin in cashins:
-    #     if not cashin.is_reportable:
-    #         continue
-    #
-    #     if caller_poolship.is_manager:
-    #         result_list.append(OpenMoneypoolCashinSerializer(cashin).data)
-    #     else:
-    #         result_list.append(RestrictedMoneypoolCashinSerializer(cashin).data)
-    # for cashout in cashouts:
-    #     if not cashout.is_reportable:
-    #         continue
-    #
-    #     if caller_poolship.is_manager:
-    #         result_list.append(OpenMoneypoolCashoutSerializer(cashout).data)
-    #     else:
-    #         result_list.append(RestrictedMoneypoolCashoutSerializer(cashout).data)
-
-    result_list.sort(key=lambda cio: cio["time"], reverse=True)
     result = dict()
-    if "page" in request.GET:
-        paginator = Paginator(result_list, default.PAGINATION)
+    if "cursor" in request.GET:
+        # keyset pagination, the page starts right after the cursor row, an empty cursor is the first one
+        cursor = None
+        if request.GET.get("cursor"):
+            cursor = decode_ledger_cursor(request.GET.get("cursor"))
+            if cursor is None:
+                return JsonResponse({"message": "not a valid cursor"}, status=400)
+        rows = list(get_ledger_rows(cashins, cashouts, cursor)[:default.PAGINATION + 1])
+        has_next = len(rows) > default.PAGINATION
+        rows = rows[:default.PAGINATION]
+        result["pagination"] = dict()
+        result["pagination"]["has_next"] = has_next
+        result["pagination"]["has_previous"] = cursor is not None
+        result["pagination"]["next_cursor"] = (
+            encode_ledger_cursor(rows[-1]) if has_next else None
+        )
+    elif "page" in request.GET:
+        paginator = Paginator(get_ledger_rows(cashins, cashouts), default.PAGINATION)
         num_page = request.GET.get("page")
         try:
-            result_list = paginator.page(num_page)
+            page = paginator.page(num_page)
         except PageNotAnInteger:
-            result_list = paginator.page(1)
+            page = paginator.page(1)
         except EmptyPage:
-            result_list = paginator.page(paginator.num_pages)
+            page = paginator.page(paginator.num_pages)
+        rows = list(page)
         result["pagination"] = dict()
-        result["pagination"]["has_next"] = result_list.has_next()
-        result["pagination"]["has_previous"] = result_list.has_previous()
+        result["pagination"]["has_next"] = page.has_next()
+        result["pagination"]["has_previous"] = page.has_previous()
+        result["pagination"]["next_cursor"] = (
+            encode_ledger_cursor(rows[-1]) if page.has_next() else None
+        )
+    else:
+        rows = list(get_ledger_rows(cashins, cashouts))
 
-    result["result"] = list(result_list)
+    result["result"] = serialize_ledger_rows(rows, is_open=caller_poolship.is_manager)
     return generate_json_ok_response(response=2050, results=result)
 
 
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from cashbox_management.models import Cashbox, Cycle, Membership, Period
+from cashbox_management.models.ledger import annotate_paid_amount, is_ledger_enabled
+from moneypool_management.models import Installment, Loan, Moneypool, Poolship
+from payment.models import Transaction
+from utils.constants import choice
+
+ACTIVE_BOX_MIN_TRANSACTIONS = 9
+ACTIVE_BOX_MIN_MEMBERS = 4
+
+BOX_CASHIN_SOURCES = (choice.TRANSACTION_SRC_GATEWAY, choice.TRANSACTION_SRC_HAMYAN_WALLET)
+BOX_CASHIN_DESTINATIONS = (
+    choice.TRANSACTION_DST_BOX_BANKACCOUNT,
+    choice.TRANSACTION_DST_HAMYAN_BOX_BALANCE,
+)
+BOX_CASHOUT_SOURCES = (
+    choice.TRANSACTION_SRC_HAMYAN_BOX_BALANCE,
+    choice.TRANSACTION_SRC_BOX_BANKACCOUNT,
+)
+
+
+def get_financial_records(days=90, using="default"):
+    """
+    the financial snapshot of the non-test CASHBOXes and the non-archived MONEYPOOLs
+    every metric is one aggregate query across all boxes
+    :param days: the count of the past days which the activity and the loans are counted in
+    :param using: the database alias which the queries run against (e.g. the read replica)
+    :return: an OrderedDict of the metric name to its value
+    """
+    start_date = (timezone.now() - timedelta(days=days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    records = OrderedDict()
+    records.update(get_cashboxes_records(start_date, using))
+    records.update(get_moneypools_records(start_date, using))
+    return records
+
+
+def get_cashboxes_records(start_date, using="default"):
+    cycles = Cycle.objects.using(using).filter(period__cashbox__is_test=False)
+    transactions = Transaction.objects.using(using).filter(
+        ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+        ctx_id__in=cycles.values("id"),
+        state=choice.TRANSACTION_STATE_SUCCESSFUL,
+        is_group_pay=False,
+    ).annotate(
+        cashbox_id=Subquery(
+            Cycle.objects.filter(id=OuterRef("ctx_id")).values("period__cashbox_id")[:1],
+            output_field=IntegerField(),
+        )
+    )
+    # the current period of a cashbox is the latest created one of its period_index
+    # (like Cashbox.get_current_period), so each cashbox is counted once
+    latest_current_periods = Period.objects.filter(
+        cashbox=OuterRef("pk"), index=OuterRef("period_index")
+    ).order_by("-created")
+    cashboxes = Cashbox.objects.using(using).filter(is_test=False)
+    current_periods = Period.objects.using(using).filter(
+        id__in=cashboxes.annotate(
+            current_period_id=Subquery(
+                latest_current_periods.values("id")[:1], output_field=IntegerField()
+            )
+        ).values("current_period_id")
+    )
+    current_memberships = Membership.objects.using(using).filter(
+        period__in=current_periods, is_owner_accept=True, is_member_accept=True
+    )
+
+    records = OrderedDict()
+
+    active_cashbox_ids = set(
+        current_memberships.values("period__cashbox_id")
+        .annotate(memberships_count=Count("id"))
+        .filter(memberships_count__gte=ACTIVE_BOX_MIN_MEMBERS)
+        .values_list("period__cashbox_id", flat=True)
+    ) & set(
+        transactions.filter(created__gte=start_date)
+        .values("cashbox_id")
+        .annotate(transactions_count=Count("id"))
+        .filter(transactions_count__gte=ACTIVE_BOX_MIN_TRANSACTIONS)
+        .values_list("cashbox_id", flat=True)
+    )
+    records["active_cashboxes_count"] = len(active_cashbox_ids)
+
+    # the balance of a cashbox (Cashbox.balance) is the balance of its current period,
+    # which is its hamyan balance plus its bank balance
+    records["cashboxes_balance"] = cashboxes.annotate(
+        current_balance=Subquery(
+            latest_current_periods.annotate(
+                current_balance=Coalesce(F("hamyan_balance"), 0) + Coalesce(F("bank_balance"), 0)
+            ).values("current_balance")[:1],
+            output_field=IntegerField(),
+        )
+    ).aggregate(balance=Coalesce(Sum("current_balance"), 0))["balance"]
+
+    loans = transactions.filter(
+        source__in=BOX_CASHOUT_SOURCES,
+        destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT,
+        created__gte=start_date,
+    ).aggregate(count=Count("id"), amount=Coalesce(Sum("amount"), 0))
+    records["cashboxes_loans_count"] = loans["count"]
+    records["cashboxes_loans_amount"] = loans["amount"]
+
+    # the paid amounts are read from the ledger only once it is backfilled and turned on,
+    # till then they are summed from the successful payments to the current cycles
+    records["cashboxes_memberships_unpaid_share"] = sum(
+        due_amount - paid_amount
+        for due_amount, paid_amount in annotate_paid_amount(
+            current_memberships, from_ledger=is_ledger_enabled()
+        )
+        .filter(paid_amount__lt=F("due_amount"))
+        .values_list("due_amount", "paid_amount")
+    )
+
+    cashins = transactions.filter(
+        source__in=BOX_CASHIN_SOURCES, destination__in=BOX_CASHIN_DESTINATIONS
+    )
+    records["cashboxes_total_cashins"] = cashins.aggregate(
+        amount=Coalesce(Sum("amount"), 0)
+    )["amount"]
+    records["cashboxes_total_cashouts"] = records["cashboxes_loans_amount"]
+    records["cashboxes_has_tr_members"] = _sum_payers_per_box(cashins, "cashbox_id")
+    return records
+
+
+def get_moneypools_records(start_date, using="default"):
+    moneypools = Moneypool.objects.using(using).filter(is_archived=False)
+    transactions = Transaction.objects.using(using).filter(
+        ctx_type=choice.TRANSACTION_CTX_TYPE_MONEYPOOL,
+        ctx_id__in=moneypools.values("id"),
+        state=choice.TRANSACTION_STATE_SUCCESSFUL,
+        is_group_pay=False,
+    )
+
+    records = OrderedDict()
+
+    active_transacted_ids = (
+        transactions.filter(created__gte=start_date)
+        .values("ctx_id")
+        .annotate(transactions_count=Count("id"))
+        .filter(transactions_count__gte=ACTIVE_BOX_MIN_TRANSACTIONS)
+        .values("ctx_id")
+    )
+    records["active_moneypools_count"] = (
+        moneypools.filter(id__in=active_transacted_ids)
+        .annotate(members_count=Count("members", distinct=True))
+        .filter(members_count__gte=ACTIVE_BOX_MIN_MEMBERS)
+        .count()
+    )
+
+    # hamyan_balance and inprogress_balance are derived on the model rather than stored,
+    # so they are still evaluated per moneypool
+    records["moneypools_balance"] = sum(
+        moneypool.hamyan_balance + moneypool.bank_balance + moneypool.inprogress_balance
+        for moneypool in moneypools.iterator()
+    )
+
+    loans = Loan.objects.using(using).filter(cashout__poolship__moneypool__in=moneypools)
+    loans_aggregate = loans.aggregate(
+        count=Count("id"), amount=Coalesce(Sum("cashout__amount"), 0)
+    )
+    records["moneypool_loans_count"] = loans_aggregate["count"]
+    records["moneypools_loans_amount"] = loans_aggregate["amount"]
+    records["moneypools_unpaid_installments_amount"] = (
+        Installment.objects.using(using)
+        .filter(loan__in=loans, cashin__isnull=True)
+        .aggregate(amount=Coalesce(Sum("amount"), 0))["amount"]
+    )
+
+    cashins = transactions.filter(
+        source__in=BOX_CASHIN_SOURCES, destination__in=BOX_CASHIN_DESTINATIONS
+    )
+    records["moneypools_total_cashins"] = cashins.aggregate(
+        amount=Coalesce(Sum("amount"), 0)
+    )["amount"]
+    records["moneypools_total_cashouts"] = transactions.filter(
+        source__in=BOX_CASHOUT_SOURCES,
+        destination=choice.TRANSACTION_DST_MEMBER_BANKACCOUNT,
+    ).aggregate(amount=Coalesce(Sum("amount"), 0))["amount"]
+    records["moneypools_has_tr_members"] = _sum_payers_per_box(cashins, "ctx_id")
+
+    # unpaid_portion is derived on the model as well
+    records["moneypool_poolships_unpaid_portion_amount"] = sum(
+        max(poolship.unpaid_portion, 0)
+        for poolship in Poolship.objects.using(using)
+        .filter(moneypool__in=moneypools, is_active=True)
+        .select_related("moneypool")
+        .iterator()
+    )
+    return records
+
+
+def _sum_payers_per_box(transactions, box_field):
+    """
+    the sum over the boxes of the count of the distinct payers of the box
+    """
+    return sum(
+        row["payers_count"]
+        for row in transactions.values(box_field)
+        .annotate(payers_count=Count("payer", distinct=True))
+        .order_by()
+    )
@@ -0,0 +1,50 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from payment.financial_records import get_financial_records
+
+
+class Command(BaseCommand):
+    help = "prints the financial snapshot of the cashboxes and the moneypools"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=90,
+            help="the count of the past days which the activity and the loans are counted in",
+        )
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS,
+            help="the database alias to run the queries against (e.g. the read replica)",
+        )
+        parser.add_argument(
+            "--format", choices=("text", "csv", "json"), default="text",
+            help="the output format",
+        )
+        parser.add_argument(
+            "--output", default=None,
+            help="the file to write the output into, the standard output if not given",
+        )
+
+    def handle(self, *args, **options):
+        records = get_financial_records(days=options["days"], using=options["database"])
+
+        if options["output"] is None:
+            self.write_records(records, options["format"], self.stdout)
+        else:
+            with open(options["output"], "w", newline="") as f:
+                self.write_records(records, options["format"], f)
+
+    @staticmethod
+    def write_records(records, output_format, f):
+        if output_format == "json":
+            f.write(json.dumps(records, indent=2) + "\n")
+        elif output_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(("metric", "value"))
+            writer.writerows(records.items())
+        else:
+            for name, value in records.items():
+                f.write("%s %s\n" % (name, value))
@@ -0,0 +1,90 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from payment.wallet_reconciliation import (
+    WALLET_RECONCILIATION_CHUNK_SIZE,
+    WALLET_RECONCILIATION_FIELDS,
+    acquire_wallet_reconciliation_lock,
+    clear_wallet_reconciliation_checkpoint,
+    get_wallet_reconciliation_checkpoint,
+    get_wallet_reconciliation_scope,
+    reconcile_wallets,
+    release_wallet_reconciliation_lock,
+)
+
+
+class Command(BaseCommand):
+    help = "reports the members whose wallet balance does not match their wallet transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start-id", type=int, default=None, help="the first member id to reconcile",
+        )
+        parser.add_argument(
+            "--end-id", type=int, default=None, help="the last member id to reconcile",
+        )
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="continue after the checkpoint of the last interrupted run of the same range and database",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=WALLET_RECONCILIATION_CHUNK_SIZE,
+            help="the count of the members reconciled per chunk",
+        )
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS,
+            help="the database alias to run the queries against (e.g. the read replica)",
+        )
+        parser.add_argument(
+            "--output", default=None,
+            help="the CSV file to write the discrepancies into, the standard output if not given",
+        )
+
+    def handle(self, *args, **options):
+        # the checkpoint is scoped by the requested range, so the runs of other ranges keep theirs
+        scope = get_wallet_reconciliation_scope(
+            options["start_id"], options["end_id"], options["database"]
+        )
+        if not acquire_wallet_reconciliation_lock(scope):
+            raise CommandError("another reconciliation of the same range is running")
+        try:
+            count = self.reconcile(scope, options)
+        finally:
+            release_wallet_reconciliation_lock(scope)
+        self.stderr.write("%d discrepancies found" % count)
+
+    def reconcile(self, scope, options):
+        start_id = options["start_id"]
+        if options["resume"]:
+            checkpoint = get_wallet_reconciliation_checkpoint(scope)
+            if checkpoint is not None:
+                start_id = checkpoint + 1
+
+        discrepancies = reconcile_wallets(
+            start_id=start_id,
+            end_id=options["end_id"],
+            chunk_size=options["chunk_size"],
+            using=options["database"],
+            checkpoint_scope=scope,
+        )
+        if options["output"] is None:
+            count = self.write_discrepancies(discrepancies, self.stdout)
+        else:
+            with open(options["output"], "w", newline="") as f:
+                count = self.write_discrepancies(discrepancies, f)
+
+        # the run is complete, so the next one of the scope starts from the beginning
+        clear_wallet_reconciliation_checkpoint(scope)
+        return count
+
+    @staticmethod
+    def write_discrepancies(discrepancies, f):
+        writer = csv.DictWriter(f, fieldnames=WALLET_RECONCILIATION_FIELDS)
+        writer.writeheader()
+        count = 0
+        for discrepancy in discrepancies:
+            writer.writerow(discrepancy)
+            count += 1
+        return count
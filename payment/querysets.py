@@ -0,0 +1,34 @@
+from payment.models.transaction import Transaction
+from utils.constants import choice
+
+
+def cycle_transactions(cycles, **filters):
+    """
+    the TRANSACTIONs of the given CYCLEs resolved through a subquery instead of a Python id list
+    :param cycles: a queryset of CYCLE objects
+    :param filters: the extra lookups to be applied on the transactions
+    :return: a queryset of TRANSACTION objects
+    """
+    return Transaction.objects.filter(
+        ctx_type=choice.TRANSACTION_CTX_TYPE_CYCLE,
+        ctx_id__in=cycles.values("id"),
+        **filters
+    )
+
+
+def period_transactions(period, **filters):
+    """
+    the TRANSACTIONs of all CYCLEs of the PERIOD
+    """
+    from cashbox_management.models import Cycle
+
+    return cycle_transactions(Cycle.objects.filter(period=period), **filters)
+
+
+def cashbox_transactions(cashbox, **filters):
+    """
+    the TRANSACTIONs of all CYCLEs of all PERIODs of the CASHBOX
+    """
+    from cashbox_management.models import Cycle
+
+    return cycle_transactions(Cycle.objects.filter(period__cashbox=cashbox), **filters)
@@ -0,0 +1,40 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from cashbox_management.models import Cashbox, Period
+from cashbox_management.models.ledger import LedgerEntry
+from cashbox_management.tests.factories import (
+    create_cycle_payment,
+    create_membership,
+    create_period,
+)
+from payment.financial_records import get_cashboxes_records
+
+
+class CashboxesRecordsTest(TestCase):
+    def test_each_cashbox_balance_is_counted_once(self):
+        cashbox = Cashbox.objects.create(name="test cashbox")
+        # a stale period which shares the index of the current one
+        Period.objects.create(cashbox=cashbox, index=1, hamyan_balance=700, bank_balance=0)
+        Period.objects.create(cashbox=cashbox, index=1, hamyan_balance=300, bank_balance=200)
+        Cashbox.objects.create(name="test cashbox", is_test=True)
+
+        records = get_cashboxes_records(timezone.now())
+
+        self.assertEqual(records["cashboxes_balance"], cashbox.balance)
+        self.assertEqual(records["cashboxes_balance"], 500)
+
+    @override_settings(LEDGER_BALANCES_ENABLED=False)
+    def test_unpaid_shares_are_read_from_the_payments_before_the_ledger_is_on(self):
+        period = create_period(share_value=100000)
+        cycle = period.cycles.get(index=period.cycle_index)
+        paid = create_membership(period, "09120000001")
+        partly_paid = create_membership(period, "09120000002")
+        create_membership(period, "09120000003")
+        create_cycle_payment(cycle, paid.member, 100000)
+        create_cycle_payment(cycle, partly_paid.member, 40000)
+        LedgerEntry.objects.all().delete()
+
+        records = get_cashboxes_records(timezone.now())
+
+        self.assertEqual(records["cashboxes_memberships_unpaid_share"], 60000 + 100000)
@@ -0,0 +1,46 @@
+from django.test import TestCase, override_settings
+
+from account_management.models import Member
+from payment.wallet_reconciliation import (
+    acquire_wallet_reconciliation_lock,
+    get_wallet_reconciliation_checkpoint,
+    get_wallet_reconciliation_scope,
+    reconcile_wallets,
+    release_wallet_reconciliation_lock,
+)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class WalletReconciliationTest(TestCase):
+    def setUp(self):
+        self.members = [
+            Member.objects.create(phone_number="0912000000%d" % index, wallet_balance=index)
+            for index in range(3)
+        ]
+
+    def test_members_without_matching_flows_are_reported(self):
+        discrepancies = list(reconcile_wallets(chunk_size=2))
+        self.assertEqual(
+            [discrepancy["member_id"] for discrepancy in discrepancies],
+            [member.id for member in self.members[1:]],
+        )
+
+    def test_checkpoints_are_kept_per_scope(self):
+        first_scope = get_wallet_reconciliation_scope(end_id=self.members[0].id)
+        second_scope = get_wallet_reconciliation_scope(start_id=self.members[1].id)
+        list(reconcile_wallets(end_id=self.members[0].id, checkpoint_scope=first_scope))
+        list(reconcile_wallets(start_id=self.members[1].id, checkpoint_scope=second_scope))
+
+        self.assertEqual(get_wallet_reconciliation_checkpoint(first_scope), self.members[0].id)
+        self.assertEqual(get_wallet_reconciliation_checkpoint(second_scope), self.members[2].id)
+
+    def test_a_scope_is_locked_by_one_run(self):
+        scope = get_wallet_reconciliation_scope()
+        self.assertTrue(acquire_wallet_reconciliation_lock(scope))
+        self.assertFalse(acquire_wallet_reconciliation_lock(scope))
+        self.assertTrue(acquire_wallet_reconciliation_lock(get_wallet_reconciliation_scope(end_id=1)))
+
+        release_wallet_reconciliation_lock(scope)
+        self.assertTrue(acquire_wallet_reconciliation_lock(scope))
@@ -12,6 +12,7 @@ from rest_framework_swagger import renderers
 from account_management.models import Client
 from cashbox_management.decorators import has_member_role, has_owner_role
 from cashbox_management.models import Membership, Cashbox
+from cashbox_management.models.ledger import annotate_paid_amount
 from payment.models import Gateway
 from payment.models.transaction import Transaction
 from utils import throttle
@@ -183,14 +184,17 @@ def request_group_pay(request, id):
         if not gateway:
             return generate_json_ok_response(1112, params="gateway")
 
+    # the paid amounts of all the memberships are loaded with one aggregate query
+    loaded_memberships = annotate_paid_amount(
+        Membership.objects.filter(id__in=[m["id"] for m in memberships], period__cashbox=cashbox)
+    ).select_related("period").in_bulk()
     membership_list = []
     commission_sum = 0
     total_sum = 0
     for m in memberships:
-        membership = Membership.objects.filter(id=m["id"], period__cashbox=cashbox)
-        if membership.count() == 0:
+        membership = loaded_memberships.get(int(m["id"]))
+        if membership is None:
             continue
-        membership = membership[0]
 
         membership_list.append(membership)
         commission_sum += membership.calculate_remaining_commission()
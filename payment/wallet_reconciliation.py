@@ -0,0 +1,141 @@
+from django.core.cache import cache
+from django.db.models import Sum
+
+from account_management.models import Member
+from payment.models import Transaction
+from utils.constants import choice
+
+WALLET_RECONCILIATION_CHUNK_SIZE = 5000
+WALLET_RECONCILIATION_CHECKPOINT_KEY = "wallet_reconciliation_checkpoint_{}"
+WALLET_RECONCILIATION_CHECKPOINT_TIMEOUT = 60 * 60 * 24 * 7
+WALLET_RECONCILIATION_LOCK_KEY = "wallet_reconciliation_lock_{}"
+# the lock is renewed on every chunk, so it only expires if its run dies
+WALLET_RECONCILIATION_LOCK_TIMEOUT = 60 * 60
+WALLET_RECONCILIATION_FIELDS = (
+    "member_id",
+    "wallet_balance",
+    "inflow",
+    "outflow",
+    "expected_balance",
+    "difference",
+)
+
+
+def get_wallet_flows(start_id, end_id, using="default"):
+    """
+    the wallet inflow and outflow of the MEMBERs of the id range (inclusive) with two grouped SUM queries
+    :return: a tuple of two dicts of member id to the inflow and to the outflow
+    """
+    transactions = Transaction.objects.using(using).filter(
+        state=choice.TRANSACTION_STATE_SUCCESSFUL, is_group_pay=False
+    )
+    inflows = (
+        transactions.filter(
+            destination=choice.TRANSACTION_DST_HAMYAN_WALLET,
+            receiver_id__gte=start_id,
+            receiver_id__lte=end_id,
+        )
+        .values("receiver_id")
+        .annotate(amount=Sum("amount"))
+        .order_by()
+    )
+    outflows = (
+        transactions.filter(
+            source=choice.TRANSACTION_SRC_HAMYAN_WALLET,
+            payer_id__gte=start_id,
+            payer_id__lte=end_id,
+        )
+        .values("payer_id")
+        .annotate(amount=Sum("amount"))
+        .order_by()
+    )
+    return (
+        {row["receiver_id"]: row["amount"] or 0 for row in inflows},
+        {row["payer_id"]: row["amount"] or 0 for row in outflows},
+    )
+
+
+def get_wallet_reconciliation_scope(start_id=None, end_id=None, using="default"):
+    """
+    the scope of a reconciliation run, which its checkpoint and its lock are keyed by
+    """
+    return "%s_%s_%s" % (
+        using, start_id if start_id is not None else "", end_id if end_id is not None else ""
+    )
+
+
+def reconcile_wallets(start_id=None, end_id=None, chunk_size=WALLET_RECONCILIATION_CHUNK_SIZE,
+                      using="default", checkpoint_scope=None):
+    """
+    compares the stored wallet_balance of the MEMBERs with their successful wallet inflow minus outflow,
+    walking the members by id in chunks of three queries each
+    :param start_id: the first member id to reconcile, None for the beginning
+    :param end_id: the last member id to reconcile, None for the end
+    :param chunk_size: the count of the members of each chunk
+    :param using: the database alias which the queries run against
+    :param checkpoint_scope: the scope which the last reconciled id of each chunk is stored in the cache
+    under (and whose lock is renewed), None for no checkpoint
+    :return: a generator of the discrepancy dicts of the WALLET_RECONCILIATION_FIELDS
+    """
+    members = Member.objects.using(using).order_by("id")
+    if end_id is not None:
+        members = members.filter(id__lte=end_id)
+    last_id = start_id - 1 if start_id is not None else None
+
+    while True:
+        chunk = members if last_id is None else members.filter(id__gt=last_id)
+        balances = list(chunk.values_list("id", "wallet_balance")[:chunk_size])
+        if len(balances) == 0:
+            break
+
+        inflows, outflows = get_wallet_flows(balances[0][0], balances[-1][0], using)
+        for member_id, wallet_balance in balances:
+            inflow = inflows.get(member_id, 0)
+            outflow = outflows.get(member_id, 0)
+            expected_balance = inflow - outflow
+            if expected_balance != wallet_balance or expected_balance < 0:
+                yield {
+                    "member_id": member_id,
+                    "wallet_balance": wallet_balance,
+                    "inflow": inflow,
+                    "outflow": outflow,
+                    "expected_balance": expected_balance,
+                    "difference": wallet_balance - expected_balance,
+                }
+
+        last_id = balances[-1][0]
+        if checkpoint_scope is not None:
+            cache.set(
+                WALLET_RECONCILIATION_CHECKPOINT_KEY.format(checkpoint_scope),
+                last_id,
+                timeout=WALLET_RECONCILIATION_CHECKPOINT_TIMEOUT,
+            )
+            cache.set(
+                WALLET_RECONCILIATION_LOCK_KEY.format(checkpoint_scope),
+                True,
+                timeout=WALLET_RECONCILIATION_LOCK_TIMEOUT,
+            )
+
+
+def get_wallet_reconciliation_checkpoint(scope):
+    """
+    the last member id which a checkpointed reconciliation of the scope has reached, None if there is none
+    """
+    return cache.get(WALLET_RECONCILIATION_CHECKPOINT_KEY.format(scope))
+
+
+def clear_wallet_reconciliation_checkpoint(scope):
+    cache.delete(WALLET_RECONCILIATION_CHECKPOINT_KEY.format(scope))
+
+
+def acquire_wallet_reconciliation_lock(scope):
+    """
+    :return: False if another reconciliation of the scope is running
+    """
+    return cache.add(
+        WALLET_RECONCILIATION_LOCK_KEY.format(scope), True, timeout=WALLET_RECONCILIATION_LOCK_TIMEOUT
+    )
+
+
+def release_wallet_reconciliation_lock(scope):
+    cache.delete(WALLET_RECONCILIATION_LOCK_KEY.format(scope))
@@ -12,6 +12,7 @@ from rest_framework_swagger import renderers
 
 from account_management.models.bankaccount import Bankaccount
 from account_management.serializers.bankaccount_serializer import BankaccountSerializer
+from cashbox_management.models import Membership
 from cashbox_management.serializers.cashbox_serializer import CashboxSerializer
 from cashbox_management.serializers.cycle_serializer import CycleSerializer
 from cashbox_management.serializers.membership_serializer import (
@@ -45,15 +46,12 @@ def cashbox_detail(request, member_key, *args, **kwargs):
     if membership.period != cashbox.get_current_period():
         return JsonResponse({"message": "the membership not found"}, status=404)
     period = cashbox.get_current_period()
+    memberships = Membership.attach_cashouts(period.get_valid_memberships())
 
     if membership.role == choice.CASHBOX_ROLE_OWNER:
-        membership_serializer = OwnerMembershipSerializer(
-            period.get_valid_memberships(), many=True
-        )
+        membership_serializer = OwnerMembershipSerializer(memberships, many=True)
     else:
-        membership_serializer = MemberMembershipSerializer(
-            period.get_valid_memberships(), many=True
-        )
+        membership_serializer = MemberMembershipSerializer(memberships, many=True)
 
     response_data = {
         "cashbox": CashboxSerializer(cashbox, many=False).data,